@@ -0,0 +1,47 @@
+from uuid import UUID
+
+from fastapi import APIRouter
+from fastapi import Query
+from fastapi import Request
+
+from app.api.sse import event_stream
+from app.exceptions import AnalysisRunNotFoundError
+from app.schemas import AnalysisRunListResponse
+from app.schemas import AnalysisRunOut
+from app.schemas import AnalyzeRenderedMessagesResponse
+
+
+router = APIRouter(prefix='/analysis-runs')
+
+
+@router.get('', response_model=AnalysisRunListResponse)
+async def list_analysis_runs(
+    request: Request,
+    offset: int = Query(0),
+    limit: int = Query(30),
+    status: str | None = Query(None),
+):
+    items = await request.app.state.storage.analysis_runs.list(offset, limit, status)
+    next_offset = offset + limit if len(items) == limit else None
+    return {'items': items, 'next_offset': next_offset}
+
+
+@router.get('/{run_id}', response_model=AnalysisRunOut)
+async def get_analysis_run(run_id: UUID, request: Request):
+    run = await request.app.state.storage.analysis_runs.get(run_id)
+    if not run:
+        raise AnalysisRunNotFoundError()
+    return run
+
+
+@router.post('/{run_id}/resume', response_model=AnalyzeRenderedMessagesResponse)
+async def resume_analysis_run(run_id: UUID, request: Request):
+    return await request.app.state.mediator.resume_analysis_run(run_id)
+
+
+@router.post('/{run_id}/resume/stream')
+async def stream_resume_analysis_run(run_id: UUID, request: Request):
+    mediator = request.app.state.mediator
+    return event_stream(
+        lambda events: mediator.resume_analysis_run(run_id, events=events),
+    )
@@ -2,6 +2,8 @@ from fastapi import APIRouter
 from fastapi import Query
 from fastapi import Request
 
+from app.api.etag import table_etag
+from app.api.sse import event_stream
 from app.schemas import AnalyzeRenderedMessagesRequest
 from app.schemas import AnalyzeRenderedMessagesResponse
 from app.schemas import ChannelCreate
@@ -24,16 +26,20 @@ async def add_channel(payload: ChannelCreate, request: Request):
     entity = await mediator.get_channel_entity_by_identifier(payload.value)
     channel = mediator.format_channel(entity)
     saved = await request.app.state.storage.channels.upsert(channel)
+    mediator.invalidate_channel(saved['id'])
+    request.app.state.live.track(saved['id'])
     return saved
 
 
 @router.delete('/{channel_id}')
 async def delete_channel(channel_id: int, request: Request):
     await request.app.state.storage.channels.delete(channel_id)
+    request.app.state.mediator.invalidate_channel(channel_id)
+    request.app.state.live.untrack(channel_id)
     return {'status': 'deleted'}
 
 
-@router.get('', response_model=ChannelListResponse)
+@router.get('', response_model=ChannelListResponse, dependencies=[table_etag('channels')])
 async def list_channels(
     request: Request,
     offset: int = Query(0),
@@ -45,7 +51,7 @@ async def list_channels(
     return {'items': items, 'next_offset': next_offset}
 
 
-@router.get('/all', response_model=list[ChannelOut])
+@router.get('/all', response_model=list[ChannelOut], dependencies=[table_etag('channels')])
 async def list_all_channels(request: Request):
     return await request.app.state.storage.channels.list_all()
 
@@ -68,6 +74,9 @@ async def get_channel_details(channel_id: int, request: Request):
 @router.post('/import-dialogs')
 async def import_dialogs(request: Request):
     saved = await request.app.state.mediator.import_dialogs()
+    for channel in saved:
+        request.app.state.mediator.invalidate_channel(channel['id'])
+        request.app.state.live.track(channel['id'])
     return {'imported': len(saved)}
 
 
@@ -77,6 +86,12 @@ async def refresh_messages(payload: RefreshMessagesRequest, request: Request):
         payload.date_from,
         payload.date_to,
         payload.channel_ids,
+        payload.concurrency,
+        payload.incremental,
+        payload.edit_lookback,
+        payload.batch_size,
+        payload.queue_size,
+        payload.lean,
     )
 
 
@@ -101,6 +116,8 @@ async def analyze_rendered_messages(
     return await request.app.state.mediator.analyze_rendered_messages(
         payload.prompt_id,
         payload.messages,
+        payload.use_cache,
+        payload.map_reduce,
     )
 
 
@@ -117,4 +134,36 @@ async def analyze_selected_channels(
         payload.channel_ids,
         payload.date_from,
         payload.date_to,
+        payload.use_cache,
+        payload.map_reduce,
+        payload.incremental,
+        payload.reply_context,
+    )
+
+
+@router.post('/analyze-rendered-messages/stream')
+async def stream_analyze_rendered_messages(
+    payload: AnalyzeRenderedMessagesRequest,
+    request: Request,
+):
+    mediator = request.app.state.mediator
+    return event_stream(
+        lambda events: mediator.analyze_rendered_messages(
+            **payload.model_dump(),
+            events=events,
+        ),
+    )
+
+
+@router.post('/analyze-selected-channels/stream')
+async def stream_analyze_selected_channels(
+    payload: AnalyzeSelectedChannelsRequest,
+    request: Request,
+):
+    mediator = request.app.state.mediator
+    return event_stream(
+        lambda events: mediator.analyze_selected_channels(
+            **payload.model_dump(),
+            events=events,
+        ),
     )
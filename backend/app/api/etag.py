@@ -0,0 +1,26 @@
+import hashlib
+from urllib.parse import urlencode
+
+from fastapi import Depends
+from fastapi import Request
+from fastapi import Response
+
+from app.exceptions import NotModified
+
+
+def table_etag(*tables: str):
+    async def check(request: Request, response: Response) -> None:
+        versions = await request.app.state.storage.table_versions.get(list(tables))
+        # Pages and filters of the same table are different representations, so the query is part of the tag.
+        query = urlencode(sorted(request.query_params.multi_items()))
+        query_hash = hashlib.blake2b(query.encode('utf-8'), digest_size=8).hexdigest()
+        etag = '"{}-{}"'.format('-'.join(str(version) for version in versions), query_hash)
+        if_none_match = request.headers.get('if-none-match')
+        if if_none_match:
+            candidates = {value.strip().removeprefix('W/') for value in if_none_match.split(',')}
+            if '*' in candidates or etag in candidates:
+                raise NotModified(etag)
+        response.headers['ETag'] = etag
+        response.headers['Cache-Control'] = 'no-cache'
+
+    return Depends(check)
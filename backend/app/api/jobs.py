@@ -0,0 +1,72 @@
+from fastapi import APIRouter
+from fastapi import Query
+from fastapi import Request
+
+from app.schemas import AnalyzeSelectedChannelsRequest
+from app.schemas import JobListResponse
+from app.schemas import JobOut
+from app.schemas import RefreshMessagesRequest
+
+
+router = APIRouter(prefix='/jobs')
+
+
+@router.post('/refresh-messages', response_model=JobOut)
+async def enqueue_refresh_messages(payload: RefreshMessagesRequest, request: Request):
+    mediator = request.app.state.mediator
+    return await request.app.state.jobs.enqueue(
+        'refresh-messages',
+        payload.model_dump(mode='json'),
+        lambda progress: mediator.refresh_messages_cache(
+            **payload.model_dump(),
+            progress=progress,
+        ),
+    )
+
+
+@router.post('/analyze-selected-channels', response_model=JobOut)
+async def enqueue_analyze_selected_channels(
+    payload: AnalyzeSelectedChannelsRequest,
+    request: Request,
+):
+    mediator = request.app.state.mediator
+    return await request.app.state.jobs.enqueue(
+        'analyze-selected-channels',
+        payload.model_dump(mode='json'),
+        lambda progress: mediator.analyze_selected_channels(
+            **payload.model_dump(),
+            progress=progress,
+        ),
+    )
+
+
+@router.post('/refresh-message-stats', response_model=JobOut)
+async def enqueue_refresh_message_stats(request: Request):
+    mediator = request.app.state.mediator
+    return await request.app.state.jobs.enqueue(
+        'refresh-message-stats',
+        {},
+        lambda progress: mediator.refresh_user_message_stats(progress=progress),
+    )
+
+
+@router.get('', response_model=JobListResponse)
+async def list_jobs(
+    request: Request,
+    offset: int = Query(0),
+    limit: int = Query(30),
+    kind: str | None = Query(None),
+):
+    items = await request.app.state.storage.jobs.list(offset, limit, kind)
+    next_offset = offset + limit if len(items) == limit else None
+    return {'items': items, 'next_offset': next_offset}
+
+
+@router.get('/{job_id}', response_model=JobOut)
+async def get_job(job_id: int, request: Request):
+    return await request.app.state.jobs.get(job_id)
+
+
+@router.post('/{job_id}/cancel', response_model=JobOut)
+async def cancel_job(job_id: int, request: Request):
+    return await request.app.state.jobs.cancel(job_id)
@@ -0,0 +1,24 @@
+from fastapi import APIRouter
+from fastapi import Request
+
+from app.schemas import LiveIngestStatus
+
+
+router = APIRouter(prefix='/live')
+
+
+@router.get('', response_model=LiveIngestStatus)
+async def get_live_status(request: Request):
+    return request.app.state.live.status()
+
+
+@router.post('/start', response_model=LiveIngestStatus)
+async def start_live(request: Request):
+    await request.app.state.live.start()
+    return request.app.state.live.status()
+
+
+@router.post('/stop', response_model=LiveIngestStatus)
+async def stop_live(request: Request):
+    await request.app.state.live.stop()
+    return request.app.state.live.status()
@@ -1,4 +1,5 @@
 from fastapi import APIRouter
+from fastapi import Request
 
 
 router = APIRouter()
@@ -7,3 +8,18 @@ router = APIRouter()
 @router.get('/health')
 async def health():
     return {'status': 'ok'}
+
+
+@router.get('/telegram/stats')
+async def telegram_stats(request: Request):
+    return request.app.state.telegram.scheduler.stats()
+
+
+@router.get('/deepseek/stats')
+async def deepseek_stats(request: Request):
+    return request.app.state.deepseek.stats()
+
+
+@router.get('/cache/stats')
+async def cache_stats(request: Request):
+    return request.app.state.mediator.cache_stats()
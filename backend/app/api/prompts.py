@@ -1,17 +1,19 @@
 from fastapi import APIRouter
 from fastapi import Request
 
+from app.api.etag import table_etag
 from app.exceptions import AppException
 from app.exceptions import PromptNotFoundError
 from app.schemas import PromptCreate
 from app.schemas import PromptOut
 from app.schemas import PromptUpdate
+from app.schemas import PromptUsageResponse
 
 
 router = APIRouter(prefix='/prompts')
 
 
-@router.get('', response_model=list[PromptOut])
+@router.get('', response_model=list[PromptOut], dependencies=[table_etag('prompts')])
 async def list_prompts(request: Request):
     return await request.app.state.storage.prompts.list()
 
@@ -24,6 +26,14 @@ async def get_prompt(prompt_id: int, request: Request):
     return prompt
 
 
+@router.get('/{prompt_id}/usage', response_model=PromptUsageResponse)
+async def get_prompt_usage(prompt_id: int, request: Request):
+    prompt = await request.app.state.storage.prompts.get(prompt_id)
+    if not prompt:
+        raise PromptNotFoundError()
+    return await request.app.state.storage.analysis_usage.totals_by_prompt(prompt_id)
+
+
 @router.post('', response_model=PromptOut)
 async def create_prompt(payload: PromptCreate, request: Request):
     title = payload.title.strip()
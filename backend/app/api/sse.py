@@ -0,0 +1,57 @@
+import asyncio
+import json
+import logging
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+
+from fastapi.responses import StreamingResponse
+
+from app.common import EventCallback
+from app.exceptions import AppException
+
+
+logger = logging.getLogger(__name__)
+
+EventRunner = Callable[[EventCallback], Awaitable[dict[str, Any]]]
+
+
+def format_event(event: str, data: Any) -> str:
+    return f'event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n'
+
+
+def event_stream(runner: EventRunner) -> StreamingResponse:
+    async def generate():
+        queue: asyncio.Queue[tuple[str, Any]] = asyncio.Queue()
+
+        async def emit(event: str, data: dict[str, Any]) -> None:
+            await queue.put((event, data))
+
+        async def run() -> None:
+            try:
+                result = await runner(emit)
+            except AppException as exc:
+                await emit('error', {'detail': exc.detail})
+            except Exception:
+                logger.exception('Streamed analysis failed')
+                await emit('error', {'detail': 'Analysis failed'})
+            else:
+                await emit('done', result)
+
+        task = asyncio.create_task(run())
+        try:
+            while True:
+                event, data = await queue.get()
+                yield format_event(event, data)
+                if event in ('done', 'error'):
+                    break
+        finally:
+            # A client that disconnects mid-stream stops the analysis instead of leaving it running unobserved.
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    return StreamingResponse(
+        generate(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
@@ -2,6 +2,7 @@ from fastapi import APIRouter
 from fastapi import Query
 from fastapi import Request
 
+from app.api.etag import table_etag
 from app.schemas import RefreshUserStatsResponse
 from app.schemas import UserDetailsResponse
 from app.schemas import UserListResponse
@@ -10,7 +11,11 @@ from app.schemas import UserListResponse
 router = APIRouter(prefix='/users')
 
 
-@router.get('', response_model=UserListResponse)
+@router.get(
+    '',
+    response_model=UserListResponse,
+    dependencies=[table_etag('users', 'messages')],
+)
 async def list_users(
     request: Request,
     offset: int = Query(0),
@@ -4,16 +4,24 @@ from fastapi import FastAPI
 from fastapi import Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from fastapi.responses import Response
 
+from .api.analysis_runs import router as analysis_runs_router
 from .api.channels import router as channels_router
+from .api.jobs import router as jobs_router
+from .api.live import router as live_router
 from .api.other import router as other_router
 from .api.prompts import router as prompts_router
 from .api.users import router as users_router
 from .config import API_ROOT_PATH
 from .config import APP_TITLE
 from .config import CORS_ORIGINS
+from .config import LIVE_INGEST_ENABLED
 from .deepseek import DeepSeek
 from .exceptions import AppException
+from .exceptions import NotModified
+from .jobs import Jobs
+from .live import LiveIngest
 from .mediator import Mediator
 from .storage import Storage
 from .telegram import Telegram
@@ -25,13 +33,22 @@ async def lifespan(app: FastAPI):
     telegram = Telegram()
     deepseek = DeepSeek()
     mediator = Mediator(telegram, deepseek, storage)
+    jobs = Jobs(storage)
+    live = LiveIngest(telegram, mediator, storage)
     await storage.init()
     await telegram.init()
+    await jobs.init()
+    if LIVE_INGEST_ENABLED:
+        await live.start()
     app.state.storage = storage
     app.state.telegram = telegram
     app.state.deepseek = deepseek
     app.state.mediator = mediator
+    app.state.jobs = jobs
+    app.state.live = live
     yield
+    await live.stop()
+    await jobs.close()
     await telegram.close()
     await storage.close()
 
@@ -53,6 +70,11 @@ async def app_exception_handler(_: Request, exc: AppException):
         content={'detail': exc.detail},
     )
 
+
+@app.exception_handler(NotModified)
+async def not_modified_handler(_: Request, exc: NotModified):
+    return Response(status_code=304, headers={'ETag': exc.etag})
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=CORS_ORIGINS,
@@ -63,4 +85,7 @@ app.add_middleware(
 app.include_router(channels_router)
 app.include_router(prompts_router)
 app.include_router(users_router)
+app.include_router(jobs_router)
+app.include_router(analysis_runs_router)
+app.include_router(live_router)
 app.include_router(other_router)
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import time
+from collections import OrderedDict
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+from typing import Hashable
+
+
+class AsyncCache:
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        negative_ttl: float,
+        negative_errors: tuple[type[BaseException], ...],
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.negative_errors = negative_errors
+        # key -> (expires_at, value, error); lookups failing with negative_errors are kept as short-lived entries.
+        self.entries: OrderedDict[Hashable, tuple[float, Any, BaseException | None]] = OrderedDict()
+        self.pending: dict[Hashable, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    async def get(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self.entries.get(key)
+        if entry is not None:
+            expires_at, value, error = entry
+            if expires_at > time.monotonic():
+                self.entries.move_to_end(key)
+                if error is not None:
+                    self.negative_hits += 1
+                    # Every hit raises the same instance, so its traceback is reset instead of growing with each raise.
+                    raise error.with_traceback(None)
+                self.hits += 1
+                return value
+            del self.entries[key]
+            self.expirations += 1
+        task = self.pending.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.create_task(self.load(key, load))
+            self.pending[key] = task
+        else:
+            self.hits += 1
+        return await asyncio.shield(task)
+
+    async def load(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await load()
+        except self.negative_errors as exc:
+            self.store(key, None, exc, self.negative_ttl)
+            raise
+        else:
+            self.store(key, value, None, self.ttl)
+            return value
+        finally:
+            if self.pending.get(key) is asyncio.current_task():
+                del self.pending[key]
+
+    def store(self, key: Hashable, value: Any, error: BaseException | None, ttl: float) -> None:
+        # A lookup invalidated while in flight is no longer pending and must not bring the stale result back.
+        if ttl <= 0 or self.pending.get(key) is not asyncio.current_task():
+            return
+        self.entries[key] = (time.monotonic() + ttl, value, error)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        if self.entries.pop(key, None) is not None:
+            self.invalidations += 1
+        self.pending.pop(key, None)
+
+    def clear(self) -> None:
+        self.invalidations += len(self.entries)
+        self.entries.clear()
+        self.pending.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            'size': len(self.entries),
+            'maxsize': self.maxsize,
+            'pending': len(self.pending),
+            'hits': self.hits,
+            'misses': self.misses,
+            'negative_hits': self.negative_hits,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+        }
+
+
+def cached(cache_attribute: str):
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, key: Hashable) -> Any:
+            cache: AsyncCache = getattr(self, cache_attribute)
+            return await cache.get(key, lambda: func(self, key))
+
+        return wrapper
+
+    return decorator
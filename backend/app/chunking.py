@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+from bisect import bisect_right
+from itertools import accumulate
+from typing import Callable
+
+from .common import safe_int
+
+
+SizeEstimator = Callable[[str], int]
+ReplyLink = Callable[[str], tuple[int | None, int | None]]
+
+
+def estimate_chars(line: str) -> int:
+    return len(line)
+
+
+def estimate_tokens(line: str) -> int:
+    # BPE tokenizers average about four UTF-8 bytes per token for both Latin and Cyrillic text.
+    return (len(line.encode('utf-8')) + 3) // 4
+
+
+SIZE_ESTIMATORS: dict[str, SizeEstimator] = {
+    'chars': estimate_chars,
+    'tokens': estimate_tokens,
+}
+
+
+def pack_lines(
+    lines: list[str],
+    budget: int,
+    estimate: SizeEstimator = estimate_chars,
+    header: str | None = None,
+    reply_link: ReplyLink | None = None,
+) -> list[list[str]]:
+    # Every line is followed by a newline except the last one, hence the extra unit in the budget.
+    capacity = budget + 1 - (estimate(header) + 1 if header else 0)
+    if reply_link:
+        chunks = _pack_threads(lines, capacity, estimate, reply_link)
+    else:
+        chunks = _pack_sequence(lines, capacity, estimate)
+    if header:
+        return [[header, *chunk] for chunk in chunks]
+    return chunks
+
+
+def _pack_sequence(lines: list[str], capacity: int, estimate: SizeEstimator) -> list[list[str]]:
+    totals = list(accumulate(estimate(line) + 1 for line in lines))
+    chunks: list[list[str]] = []
+    start = 0
+    consumed = 0
+    while start < len(lines):
+        # A single line larger than the budget still gets a chunk of its own.
+        end = max(bisect_right(totals, consumed + capacity, start), start + 1)
+        chunks.append(lines[start:end])
+        consumed = totals[end - 1]
+        start = end
+    return chunks
+
+
+def _pack_threads(
+    lines: list[str],
+    capacity: int,
+    estimate: SizeEstimator,
+    reply_link: ReplyLink,
+) -> list[list[str]]:
+    sizes = [estimate(line) + 1 for line in lines]
+    chunks: list[list[int]] = []
+    current: list[int] = []
+    current_size = 0
+    for group in group_reply_threads(lines, reply_link):
+        group_size = sum(sizes[index] for index in group)
+        if current and current_size + group_size > capacity:
+            chunks.append(current)
+            current = []
+            current_size = 0
+        if current_size + group_size <= capacity:
+            current.extend(group)
+            current_size += group_size
+            continue
+        # A thread that does not fit into an empty chunk is packed line by line.
+        for index in group:
+            if current and current_size + sizes[index] > capacity:
+                chunks.append(current)
+                current = []
+                current_size = 0
+            current.append(index)
+            current_size += sizes[index]
+    if current:
+        chunks.append(current)
+    # Threads are packed as units, then each chunk is put back into chronological order.
+    return [[lines[index] for index in sorted(chunk)] for chunk in chunks]
+
+
+def group_for_reduce(
+    items: list[str],
+    fan_in: int,
+    budget: int,
+    estimate: SizeEstimator = estimate_chars,
+) -> list[list[str]]:
+    # Every group but a trailing one holds at least two items, so each reduce level shrinks the list.
+    fan_in = max(fan_in, 2)
+    groups: list[list[str]] = []
+    current: list[str] = []
+    current_size = 0
+    for item in items:
+        item_size = estimate(item) + 1
+        if len(current) >= 2 and (len(current) >= fan_in or current_size + item_size > budget + 1):
+            groups.append(current)
+            current = []
+            current_size = 0
+        current.append(item)
+        current_size += item_size
+    if current:
+        groups.append(current)
+    return groups
+
+
+def parse_message_line_link(line: str) -> tuple[int | None, int | None]:
+    # Reverses the 'time message_id user_id [@username] [-> reply_message_id]' prefix of rendered message lines.
+    parts = line.split(': ', 1)[0].split(' ')
+    message_id = safe_int(parts[1]) if len(parts) > 1 else None
+    reply_id = None
+    if '->' in parts[2:]:
+        reply_index = parts.index('->', 2) + 1
+        reply_id = safe_int(parts[reply_index]) if reply_index < len(parts) else None
+    return message_id, reply_id
+
+
+def group_reply_threads(lines: list[str], reply_link: ReplyLink) -> list[list[int]]:
+    parents = list(range(len(lines)))
+
+    def find(index: int) -> int:
+        while parents[index] != index:
+            parents[index] = parents[parents[index]]
+            index = parents[index]
+        return index
+
+    index_by_message_id: dict[int, int] = {}
+    links: list[tuple[int, int]] = []
+    for index, line in enumerate(lines):
+        message_id, reply_id = reply_link(line)
+        if message_id is not None:
+            index_by_message_id[message_id] = index
+        if reply_id is not None:
+            links.append((index, reply_id))
+    for index, reply_id in links:
+        parent = index_by_message_id.get(reply_id)
+        if parent is not None:
+            parents[find(index)] = find(parent)
+    groups: dict[int, list[int]] = {}
+    for index in range(len(lines)):
+        groups.setdefault(find(index), []).append(index)
+    return sorted(groups.values(), key=lambda group: group[0])
@@ -1,11 +1,19 @@
 from __future__ import annotations
 
+import asyncio
 from datetime import datetime
 from datetime import timezone
 from typing import Any
+from typing import Awaitable
+from typing import Callable
+from typing import Coroutine
 from typing import Iterable
 
 
+ProgressCallback = Callable[[int, dict[str, Any]], Awaitable[None]]
+EventCallback = Callable[[str, dict[str, Any]], Awaitable[None]]
+
+
 def safe_int(value: Any) -> int | None:
     if value is None:
         return None
@@ -49,3 +57,13 @@ def normalize_datetime(value: Any) -> datetime | None:
             return parsed
         return parsed.replace(tzinfo=timezone.utc)
     return None
+
+
+async def gather_or_cancel(coroutines: Iterable[Coroutine[Any, Any, Any]]) -> list[Any]:
+    # Unlike asyncio.gather, the first failure cancels the remaining coroutines and is raised as is.
+    try:
+        async with asyncio.TaskGroup() as group:
+            tasks = [group.create_task(coroutine) for coroutine in coroutines]
+    except ExceptionGroup as errors:
+        raise errors.exceptions[0]
+    return [task.result() for task in tasks]
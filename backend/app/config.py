@@ -1,4 +1,5 @@
 import os
+from datetime import timedelta
 from pathlib import Path
 
 
@@ -11,11 +12,73 @@ CORS_ORIGINS = ['*']
 POSTGRES_URL = os.environ['POSTGRES_URL']
 DB_POOL_MIN = 1
 DB_POOL_MAX = 10
+MESSAGES_BULK_UPSERT_MIN_ROWS = 1000
+MESSAGES_LEAN_INGEST = False
+
+LIVE_INGEST_ENABLED = os.environ.get('LIVE_INGEST_ENABLED', '').lower() in ('1', 'true', 'yes')
+LIVE_INGEST_BATCH_SIZE = 100
+LIVE_INGEST_FLUSH_INTERVAL = 5
+
+REFRESH_MESSAGES_CONCURRENCY = 4
+REFRESH_MESSAGES_BATCH_SIZE = 200
+REFRESH_MESSAGES_QUEUE_SIZE = 4
 
 TELEGRAM_API_ID = int(os.environ['TELEGRAM_API_ID'])
 TELEGRAM_API_HASH = os.environ['TELEGRAM_API_HASH']
 TELETHON_STRING_SESSION = os.environ['TELETHON_STRING_SESSION']
+# Token buckets per method class: (requests per second, burst).
+TELEGRAM_RATE_LIMITS = {
+    'history': (3.0, 5),
+    'entity': (2.0, 5),
+    'resolve': (0.2, 2),
+    'full': (1.0, 3),
+    'dialogs': (0.5, 1),
+    'default': (5.0, 10),
+}
+TELEGRAM_METHOD_CLASSES = {
+    'GetHistoryRequest': 'history',
+    'GetMessagesRequest': 'history',
+    'GetUsersRequest': 'entity',
+    'GetChannelsRequest': 'entity',
+    'GetChatsRequest': 'entity',
+    'ResolveUsernameRequest': 'resolve',
+    'GetFullUserRequest': 'full',
+    'GetFullChannelRequest': 'full',
+    'GetFullChatRequest': 'full',
+    'GetDialogsRequest': 'dialogs',
+}
+TELEGRAM_FLOOD_WAIT_MAX = 300
+TELEGRAM_FLOOD_WAIT_RETRIES = 3
+ENTITY_CACHE_MAXSIZE = 10_000
+ENTITY_CACHE_TTL = 3600
+ENTITY_CACHE_NEGATIVE_TTL = 30
 
 DEEPSEEK_API_KEY = os.environ['DEEPSEEK_API_KEY']
 DEEPSEEK_BASE_URL = 'https://api.deepseek.com'
 DEEPSEEK_MODEL = os.environ.get('DEEPSEEK_MODEL', 'deepseek-chat')
+DEEPSEEK_TIMEOUT = 120.0
+DEEPSEEK_RETRIES = 3
+DEEPSEEK_RETRY_BASE_DELAY = 1.0
+DEEPSEEK_RETRY_MAX_DELAY = 30.0
+# A duplicate request is sent once a call outlives this latency percentile; None disables hedging.
+DEEPSEEK_HEDGE_PERCENTILE = 0.95
+DEEPSEEK_HEDGE_MIN_SAMPLES = 20
+DEEPSEEK_LATENCY_WINDOW = 200
+DEEPSEEK_BREAKER_FAILURES = 5
+DEEPSEEK_BREAKER_RESET = 30.0
+ANALYSIS_CACHE_TTL = timedelta(days=30)
+ANALYSIS_CACHE_MAX_ENTRIES = 10_000
+# Chunk budget is measured in units of the estimator: 'chars' or approximate 'tokens'.
+ANALYSIS_CHUNK_ESTIMATOR = 'chars'
+ANALYSIS_CHUNK_BUDGET = 30_000
+ANALYSIS_KEEP_REPLY_THREADS = False
+ANALYSIS_REDUCE_FAN_IN = 4
+ANALYSIS_REDUCE_INSTRUCTION = (
+    'The input is a set of partial results produced by the instruction above '
+    'for consecutive parts of the same conversation, one result per line group. '
+    'Merge them into a single result in exactly the same JSON format: '
+    'one object per user id, with the conclusions for that id combined and deduplicated.'
+)
+ANALYSIS_CHUNK_CONCURRENCY = 4
+ANALYSIS_RENDER_CONCURRENCY = 4
+ANALYSIS_CHANNEL_CONCURRENCY = 2
@@ -1,16 +1,144 @@
+import asyncio
+import logging
+import random
+import time
+from contextlib import contextmanager
+from typing import Any
+from typing import AsyncIterator
+from typing import Awaitable
+from typing import Callable
+from typing import Iterator
+
+from openai import APIConnectionError
+from openai import APIStatusError
 from openai import AsyncOpenAI
 
 from .config import DEEPSEEK_API_KEY
 from .config import DEEPSEEK_BASE_URL
+from .config import DEEPSEEK_BREAKER_FAILURES
+from .config import DEEPSEEK_BREAKER_RESET
+from .config import DEEPSEEK_HEDGE_MIN_SAMPLES
+from .config import DEEPSEEK_HEDGE_PERCENTILE
+from .config import DEEPSEEK_LATENCY_WINDOW
 from .config import DEEPSEEK_MODEL
+from .config import DEEPSEEK_RETRIES
+from .config import DEEPSEEK_RETRY_BASE_DELAY
+from .config import DEEPSEEK_RETRY_MAX_DELAY
+from .config import DEEPSEEK_TIMEOUT
+from .exceptions import DeepSeekUnavailableError
+from .resilience import CircuitBreaker
+from .resilience import LatencyWindow
+
+
+logger = logging.getLogger(__name__)
 
 
 class DeepSeek:
     def __init__(self) -> None:
+        self.model: str = DEEPSEEK_MODEL
+        # Retries are handled here, so the client's own retry loop is disabled.
         self.client: AsyncOpenAI = AsyncOpenAI(
             api_key=DEEPSEEK_API_KEY,
             base_url=DEEPSEEK_BASE_URL,
+            timeout=DEEPSEEK_TIMEOUT,
+            max_retries=0,
+        )
+        self.breaker = CircuitBreaker(DEEPSEEK_BREAKER_FAILURES, DEEPSEEK_BREAKER_RESET)
+        self.latencies = LatencyWindow(DEEPSEEK_LATENCY_WINDOW, DEEPSEEK_HEDGE_MIN_SAMPLES)
+        self.retries = 0
+        self.hedges = 0
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'retries': self.retries,
+            'hedges': self.hedges,
+            'breaker_open': self.breaker.opened_at is not None,
+            'hedge_after': self.latencies.percentile(DEEPSEEK_HEDGE_PERCENTILE)
+            if DEEPSEEK_HEDGE_PERCENTILE else None,
+        }
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        if isinstance(error, APIConnectionError):
+            return True
+        if isinstance(error, APIStatusError):
+            return error.status_code in (408, 409, 429) or error.status_code >= 500
+        return False
+
+    def _retry_delay(self, attempt: int, error: Exception) -> float | None:
+        if attempt >= DEEPSEEK_RETRIES or not self._is_retryable(error):
+            return None
+        # Full jitter keeps concurrent chunks from retrying in lockstep.
+        delay = random.uniform(0, min(DEEPSEEK_RETRY_MAX_DELAY, DEEPSEEK_RETRY_BASE_DELAY * 2 ** attempt))
+        if isinstance(error, APIStatusError):
+            try:
+                delay = max(delay, float(error.response.headers.get('retry-after', 0)))
+            except ValueError:
+                pass
+        logger.warning(
+            'DeepSeek request failed, retrying in %.1fs (attempt %s/%s): %s',
+            delay,
+            attempt + 1,
+            DEEPSEEK_RETRIES,
+            error,
         )
+        self.retries += 1
+        return delay
+
+    @contextmanager
+    def _breaker_call(self) -> Iterator[None]:
+        if not self.breaker.allow():
+            raise DeepSeekUnavailableError()
+        try:
+            yield
+        except Exception as exc:
+            # Only transport and server failures count against the API; a rejected request still got an answer.
+            if self._is_retryable(exc):
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            raise
+        except BaseException:
+            # A cancelled or abandoned call proves nothing either way, but must not hold the half-open probe.
+            self.breaker.release()
+            raise
+        self.breaker.record_success()
+
+    async def _create(self, **kwargs) -> Any:
+        with self._breaker_call():
+            return await self.client.chat.completions.create(model=self.model, **kwargs)
+
+    async def _timed_create(self, **kwargs) -> Any:
+        started_at = time.monotonic()
+        result = await self._create(**kwargs)
+        self.latencies.add(time.monotonic() - started_at)
+        return result
+
+    async def _hedged(self, request: Callable[[], Awaitable[Any]]) -> Any:
+        hedge_after = self.latencies.percentile(DEEPSEEK_HEDGE_PERCENTILE) if DEEPSEEK_HEDGE_PERCENTILE else None
+        if hedge_after is None:
+            return await request()
+        tasks = [asyncio.create_task(request())]
+        pending = set(tasks)
+        try:
+            done, _ = await asyncio.wait(pending, timeout=hedge_after)
+            if not done:
+                self.hedges += 1
+                tasks.append(asyncio.create_task(request()))
+                pending.add(tasks[-1])
+            error: BaseException | None = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+            # Collects the losers' outcomes so their errors are not reported as never retrieved.
+            await asyncio.gather(*tasks, return_exceptions=True)
 
     @staticmethod
     def _normalize_chat_content(value) -> str:
@@ -35,20 +163,101 @@ class DeepSeek:
             return '\n'.join(parts).strip()
         return str(value).strip()
 
-    async def analyze_messages(self, base_prompt: str, messages: list[str]) -> str:
-        rendered_messages = '\n'.join(
-            str(message).strip() for message in messages if str(message).strip()
-        ).strip()
-        if not rendered_messages:
-            return ''
-        completion = await self.client.chat.completions.create(
-            model=DEEPSEEK_MODEL,
-            messages=[
-                {'role': 'system', 'content': base_prompt.strip()},
-                {'role': 'user', 'content': rendered_messages},
-            ],
-            stream=False,
-        )
+    @staticmethod
+    def _build_chat_messages(base_prompt: str, messages: list[str]) -> list[dict[str, str]] | None:
+        lines = [str(message).strip() for message in messages if str(message).strip()]
+        system_prompt = base_prompt.strip()
+        # The format hint goes after the prompt, so every chunk shares a byte-stable prefix for the context cache.
+        if lines and lines[0].startswith('FORMAT:'):
+            system_prompt = f'{system_prompt}\n\n{lines.pop(0)}'
+        if not lines:
+            return None
+        return [
+            {'role': 'system', 'content': system_prompt},
+            {'role': 'user', 'content': '\n'.join(lines)},
+        ]
+
+    @staticmethod
+    def _format_usage(usage) -> dict[str, int] | None:
+        if usage is None:
+            return None
+        prompt_tokens = usage.prompt_tokens or 0
+        cache_hit_tokens = getattr(usage, 'prompt_cache_hit_tokens', None)
+        if cache_hit_tokens is None:
+            details = usage.prompt_tokens_details
+            cache_hit_tokens = details.cached_tokens if details else None
+        cache_hit_tokens = cache_hit_tokens or 0
+        cache_miss_tokens = getattr(usage, 'prompt_cache_miss_tokens', None)
+        if cache_miss_tokens is None:
+            cache_miss_tokens = prompt_tokens - cache_hit_tokens
+        return {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': usage.completion_tokens or 0,
+            'cache_hit_tokens': cache_hit_tokens,
+            'cache_miss_tokens': cache_miss_tokens,
+        }
+
+    async def analyze_messages(
+        self,
+        base_prompt: str,
+        messages: list[str],
+    ) -> tuple[str, dict[str, int] | None]:
+        chat_messages = self._build_chat_messages(base_prompt, messages)
+        if not chat_messages:
+            return '', None
+        attempt = 0
+        while True:
+            try:
+                completion = await self._hedged(
+                    lambda: self._timed_create(messages=chat_messages, stream=False),
+                )
+                break
+            except Exception as exc:
+                delay = self._retry_delay(attempt, exc)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
+        usage = self._format_usage(completion.usage)
         if not completion.choices:
-            return ''
-        return self._normalize_chat_content(completion.choices[0].message.content)
+            return '', usage
+        return self._normalize_chat_content(completion.choices[0].message.content), usage
+
+    async def stream_analysis(
+        self,
+        base_prompt: str,
+        messages: list[str],
+    ) -> AsyncIterator[tuple[str, dict[str, int] | None]]:
+        chat_messages = self._build_chat_messages(base_prompt, messages)
+        if not chat_messages:
+            return
+        attempt = 0
+        while True:
+            streamed = False
+            try:
+                # The breaker judges the whole stream, so a stream that breaks off counts as a failure.
+                with self._breaker_call():
+                    stream = await self.client.chat.completions.create(
+                        model=self.model,
+                        messages=chat_messages,
+                        stream=True,
+                        stream_options={'include_usage': True},
+                    )
+                    async for chunk in stream:
+                        # Usage arrives in a final chunk without choices.
+                        if chunk.usage is not None:
+                            yield '', self._format_usage(chunk.usage)
+                        if not chunk.choices:
+                            continue
+                        content = chunk.choices[0].delta.content
+                        if content:
+                            streamed = True
+                            yield content, None
+                return
+            except Exception as exc:
+                # Tokens already forwarded to the client cannot be taken back, so only a silent stream is retried.
+                delay = None if streamed else self._retry_delay(attempt, exc)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
@@ -7,6 +7,17 @@ class AppException(Exception):
         super().__init__(self.detail)
 
 
+class NotModified(Exception):
+    def __init__(self, etag: str) -> None:
+        self.etag = etag
+        super().__init__(etag)
+
+
+class DeepSeekUnavailableError(AppException):
+    status_code = 503
+    detail = 'DeepSeek is temporarily unavailable'
+
+
 class NotFoundError(AppException):
     status_code = 404
     detail = 'Not found'
@@ -34,3 +45,11 @@ class UserEntityTypeError(AppException):
 
 class PromptNotFoundError(NotFoundError):
     detail = 'Prompt is not found'
+
+
+class JobNotFoundError(NotFoundError):
+    detail = 'Job is not found'
+
+
+class AnalysisRunNotFoundError(NotFoundError):
+    detail = 'Analysis run is not found'
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+
+from .common import ProgressCallback
+from .exceptions import AppException
+from .exceptions import JobNotFoundError
+from .ratelimit import background_priority
+from .storage import Storage
+
+
+logger = logging.getLogger(__name__)
+
+JobRunner = Callable[[ProgressCallback], Awaitable[dict[str, Any]]]
+
+
+class Jobs:
+    def __init__(self, storage: Storage) -> None:
+        self.storage = storage
+        self.tasks: dict[int, asyncio.Task] = {}
+        self.cancel_requested: set[int] = set()
+
+    async def init(self) -> None:
+        interrupted = await self.storage.jobs.interrupt_unfinished()
+        if interrupted:
+            logger.warning('Marked %s unfinished jobs as interrupted', interrupted)
+
+    async def close(self) -> None:
+        tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def enqueue(
+        self,
+        kind: str,
+        params: dict[str, Any],
+        runner: JobRunner,
+    ) -> dict[str, Any]:
+        job = await self.storage.jobs.create(kind, params)
+        job_id = job['id']
+        self.tasks[job_id] = asyncio.create_task(self._run(job_id, runner))
+        return job
+
+    async def get(self, job_id: int) -> dict[str, Any]:
+        job = await self.storage.jobs.get(job_id)
+        if not job:
+            raise JobNotFoundError()
+        return job
+
+    async def cancel(self, job_id: int) -> dict[str, Any]:
+        task = self.tasks.get(job_id)
+        if task is None:
+            return await self.get(job_id)
+        self.cancel_requested.add(job_id)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return await self.get(job_id)
+
+    async def _run(self, job_id: int, runner: JobRunner) -> None:
+        progress: dict[str, Any] = {'channels': {}}
+        progress_lock = asyncio.Lock()
+
+        async def report(channel_id: int, state: dict[str, Any]) -> None:
+            # Snapshots are written under a lock so a slower write never overwrites a newer one.
+            async with progress_lock:
+                progress['channels'][str(channel_id)] = state
+                await self.storage.jobs.update_progress(job_id, progress)
+
+        try:
+            await self.storage.jobs.start(job_id)
+            with background_priority():
+                result = await runner(report)
+        except asyncio.CancelledError:
+            status = 'cancelled' if job_id in self.cancel_requested else 'interrupted'
+            await self.storage.jobs.finish(job_id, status)
+            raise
+        except AppException as exc:
+            await self.storage.jobs.finish(job_id, 'failed', error=exc.detail)
+        except Exception:
+            logger.exception('Job failed (job_id=%s)', job_id)
+            await self.storage.jobs.finish(job_id, 'failed', error='Job failed')
+        else:
+            await self.storage.jobs.finish(job_id, 'completed', result=result)
+        finally:
+            self.tasks.pop(job_id, None)
+            self.cancel_requested.discard(job_id)
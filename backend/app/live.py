@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any
+
+from telethon import events
+from telethon import utils
+
+from .config import LIVE_INGEST_BATCH_SIZE
+from .config import LIVE_INGEST_FLUSH_INTERVAL
+from .config import MESSAGES_LEAN_INGEST
+from .mediator import Mediator
+from .storage import Storage
+from .telegram import Telegram
+
+
+logger = logging.getLogger(__name__)
+
+
+class LiveIngest:
+    def __init__(self, telegram: Telegram, mediator: Mediator, storage: Storage) -> None:
+        self.telegram = telegram
+        self.mediator = mediator
+        self.storage = storage
+        self.channel_ids: set[int] = set()
+        self.buffers: dict[int, dict[int, dict[str, Any]]] = {}
+        self.write_lock = asyncio.Lock()
+        self.flush_task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self.flush_task is not None
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        channels = await self.storage.channels.list_all()
+        self.channel_ids = {channel['id'] for channel in channels}
+        client = self.telegram.client
+        client.add_event_handler(self.on_message, events.NewMessage())
+        client.add_event_handler(self.on_message, events.MessageEdited())
+        client.add_event_handler(self.on_deleted, events.MessageDeleted())
+        self.flush_task = asyncio.create_task(self.flush_periodically())
+
+    async def stop(self) -> None:
+        if not self.running:
+            return
+        client = self.telegram.client
+        client.remove_event_handler(self.on_message)
+        client.remove_event_handler(self.on_deleted)
+        self.flush_task.cancel()
+        await asyncio.gather(self.flush_task, return_exceptions=True)
+        self.flush_task = None
+        await self.flush()
+
+    def track(self, channel_id: int) -> None:
+        self.channel_ids.add(channel_id)
+
+    def untrack(self, channel_id: int) -> None:
+        self.channel_ids.discard(channel_id)
+        self.buffers.pop(channel_id, None)
+
+    def status(self) -> dict[str, Any]:
+        return {
+            'running': self.running,
+            'channels': len(self.channel_ids),
+            'buffered': sum(len(buffer) for buffer in self.buffers.values()),
+        }
+
+    async def on_message(self, event: events.NewMessage.Event) -> None:
+        channel_id = self.resolve_channel_id(event.chat_id)
+        if channel_id is None:
+            return
+        message = event.message
+        payload = self.mediator.message_payload(message, MESSAGES_LEAN_INGEST)
+        if not payload:
+            return
+        payload['date'] = message.date
+        # Keyed by message id so an edit arriving before the flush replaces the buffered version.
+        self.buffers.setdefault(channel_id, {})[message.id] = payload
+        if sum(len(buffer) for buffer in self.buffers.values()) >= LIVE_INGEST_BATCH_SIZE:
+            await self.flush()
+
+    async def on_deleted(self, event: events.MessageDeleted.Event) -> None:
+        # Deletions outside channels and megagroups arrive without a chat id and can't be attributed.
+        channel_id = self.resolve_channel_id(event.chat_id)
+        if channel_id is None:
+            return
+        async with self.write_lock:
+            buffer = self.buffers.get(channel_id, {})
+            for message_id in event.deleted_ids:
+                buffer.pop(message_id, None)
+            try:
+                await self.storage.messages.delete_many(channel_id, event.deleted_ids)
+            except Exception:
+                logger.exception(
+                    'Failed to delete live messages (channel_id=%s)',
+                    channel_id,
+                )
+
+    async def flush(self) -> None:
+        async with self.write_lock:
+            buffers, self.buffers = self.buffers, {}
+            for channel_id, buffer in buffers.items():
+                if not buffer:
+                    continue
+                try:
+                    await self.storage.messages.upsert_many(channel_id, list(buffer.values()))
+                except Exception:
+                    logger.exception(
+                        'Failed to store live messages (channel_id=%s)',
+                        channel_id,
+                    )
+
+    async def flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(LIVE_INGEST_FLUSH_INTERVAL)
+            await self.flush()
+
+    def resolve_channel_id(self, chat_id: int | None) -> int | None:
+        if chat_id is None:
+            return None
+        channel_id, _ = utils.resolve_id(chat_id)
+        if channel_id not in self.channel_ids:
+            return None
+        return channel_id
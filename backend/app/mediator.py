@@ -1,97 +1,130 @@
 from __future__ import annotations
 
 import asyncio
-import functools
 import json
 import logging
 import re
-from datetime import datetime, timezone
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
 from typing import Any
+from typing import Awaitable
+from typing import Callable
+from uuid import UUID
+from uuid import uuid4
 
+from telethon import utils
+from telethon.errors import BadRequestError
 from telethon.tl.functions.channels import GetFullChannelRequest
 from telethon.tl.functions.messages import GetFullChatRequest
 from telethon.tl.functions.users import GetFullUserRequest
 from telethon.tl.types import Channel
 from telethon.tl.types import Chat
+from telethon.tl.types import InputPeerChannel
+from telethon.tl.types import InputPeerChat
+from telethon.tl.types import InputPeerUser
+from telethon.tl.types import Message
 from telethon.tl.types import User
 
+from .cache import AsyncCache
+from .cache import cached
+from .chunking import SIZE_ESTIMATORS
+from .chunking import group_for_reduce
+from .chunking import pack_lines
+from .chunking import parse_message_line_link
+from .common import EventCallback
+from .common import ProgressCallback
+from .common import gather_or_cancel
+from .common import normalize_datetime
 from .common import normalize_message_text
 from .common import safe_int
+from .config import ANALYSIS_CHANNEL_CONCURRENCY
+from .config import ANALYSIS_CHUNK_BUDGET
+from .config import ANALYSIS_CHUNK_CONCURRENCY
+from .config import ANALYSIS_CHUNK_ESTIMATOR
+from .config import ANALYSIS_KEEP_REPLY_THREADS
+from .config import ANALYSIS_REDUCE_FAN_IN
+from .config import ANALYSIS_REDUCE_INSTRUCTION
+from .config import ANALYSIS_RENDER_CONCURRENCY
+from .config import ENTITY_CACHE_MAXSIZE
+from .config import ENTITY_CACHE_NEGATIVE_TTL
+from .config import ENTITY_CACHE_TTL
+from .config import MESSAGES_LEAN_INGEST
+from .config import REFRESH_MESSAGES_BATCH_SIZE
+from .config import REFRESH_MESSAGES_CONCURRENCY
+from .config import REFRESH_MESSAGES_QUEUE_SIZE
 from .deepseek import DeepSeek
+from .exceptions import AnalysisRunNotFoundError
 from .exceptions import AppException
 from .exceptions import ChannelEntityTypeError
 from .exceptions import ChannelHasNoUsernameError
 from .exceptions import ChannelNotFoundError
+from .exceptions import DeepSeekUnavailableError
 from .exceptions import EmptyChannelIdentifierError
 from .exceptions import PromptNotFoundError
 from .exceptions import UserEntityTypeError
+from .ratelimit import background_priority
 from .storage import Storage
 from .telegram import Telegram
 
 logger = logging.getLogger(__name__)
 
 
-def async_cache(func):
-    cache_name = f'_{func.__name__}_cache'
-
-    @functools.wraps(func)
-    async def wrapper(self, *args, **kwargs):
-        cache = getattr(self, cache_name, None)
-        if cache is None:
-            cache = {}
-            setattr(self, cache_name, cache)
-        key = (args, tuple(sorted(kwargs.items())))
-        if key in cache:
-            cached = cache[key]
-            if asyncio.isfuture(cached):
-                return await cached
-            return cached
-        task = asyncio.create_task(func(self, *args, **kwargs))
-        cache[key] = task
-        try:
-            result = await task
-        except Exception:
-            cache.pop(key, None)
-            raise
-        cache[key] = result
-        return result
-
-    return wrapper
-
-
 class Mediator:
     _DROP_PAYLOAD_VALUE = object()
-    _MAX_ANALYSIS_CHUNK_SIZE = 30_000
+    _CHANNEL_PEER_TYPES = ['channel', 'chat']
+    _USER_PEER_TYPES = ['user']
+    # Lookups failing with these are final; flood waits, timeouts and network errors are worth retrying.
+    _ENTITY_LOOKUP_ERRORS = (ValueError, TypeError, BadRequestError)
 
     def __init__(self, telegram: Telegram, deepseek: DeepSeek, storage: Storage) -> None:
         self.telegram = telegram
         self.deepseek = deepseek
         self.storage = storage
+        self.active_runs: set[UUID] = set()
+        self.channel_entities = AsyncCache(
+            ENTITY_CACHE_MAXSIZE,
+            ENTITY_CACHE_TTL,
+            ENTITY_CACHE_NEGATIVE_TTL,
+            (AppException, *self._ENTITY_LOOKUP_ERRORS),
+        )
+        self.user_entities = AsyncCache(
+            ENTITY_CACHE_MAXSIZE,
+            ENTITY_CACHE_TTL,
+            ENTITY_CACHE_NEGATIVE_TTL,
+            (AppException, *self._ENTITY_LOOKUP_ERRORS),
+        )
 
-    @async_cache
+    @cached('channel_entities')
     async def get_channel_entity(self, channel_id: int) -> Channel | Chat:
         channel = await self.storage.channels.get(channel_id)
         if not channel:
             raise ChannelNotFoundError()
-        entity = None
-        if channel_id > 0:
+        entity = await self.get_stored_entity(channel_id, self._CHANNEL_PEER_TYPES)
+        if not isinstance(entity, (Channel, Chat)) and channel_id > 0:
             peer_id = self.make_channel_peer_id(channel_id)
             entity = await self.safe_get_entity(peer_id)
         if not isinstance(entity, (Channel, Chat)):
             entity = await self.safe_get_entity(channel_id)
-        if isinstance(entity, (Channel, Chat)):
-            return entity
-        username = channel.get('username')
-        if not username:
-            raise ChannelHasNoUsernameError()
-        identifier = self.normalize_identifier(username)
-        if identifier is None:
-            raise ChannelHasNoUsernameError()
-        entity = await self.telegram.client.get_entity(identifier)
         if not isinstance(entity, (Channel, Chat)):
-            raise ChannelEntityTypeError()
+            username = channel.get('username')
+            if not username:
+                raise ChannelHasNoUsernameError()
+            identifier = self.normalize_identifier(username)
+            if identifier is None:
+                raise ChannelHasNoUsernameError()
+            entity = await self.telegram.client.get_entity(identifier)
+            if not isinstance(entity, (Channel, Chat)):
+                raise ChannelEntityTypeError()
+        await self.save_entities([entity])
         return entity
 
+    async def get_channel_input_peer(self, channel_id: int) -> InputPeerChannel | InputPeerChat:
+        input_peer = await self.get_stored_input_peer(channel_id, self._CHANNEL_PEER_TYPES)
+        if input_peer is None:
+            input_peer = utils.get_input_peer(await self.get_channel_entity(channel_id))
+        return input_peer
+
     async def get_channel_entity_by_identifier(self, value: str) -> Channel | Chat:
         normalized = self.normalize_identifier(value)
         if normalized is None:
@@ -107,30 +140,75 @@ class Mediator:
             entity = await self.safe_get_entity(normalized)
         if not isinstance(entity, (Channel, Chat)):
             raise ChannelEntityTypeError()
+        await self.save_entities([entity])
         return entity
 
-    @async_cache
+    @cached('user_entities')
     async def get_user_entity(self, user_id: int) -> User:
-        try:
-            entity = await self.telegram.client.get_entity(user_id)
-        except Exception:
-            entity = None
-        if isinstance(entity, User):
-            return entity
-        user_data = await self.storage.users.get(user_id)
-        username = user_data.get('username') if user_data else None
-        if not username:
-            raise UserEntityTypeError()
-        identifier = self.normalize_identifier(username)
-        if identifier is None:
-            raise UserEntityTypeError()
-        entity = await self.telegram.client.get_entity(identifier)
+        entity = await self.get_stored_entity(user_id, self._USER_PEER_TYPES)
+        if not isinstance(entity, User):
+            entity = await self.safe_get_entity(user_id)
         if not isinstance(entity, User):
-            raise UserEntityTypeError()
+            user_data = await self.storage.users.get(user_id)
+            username = user_data.get('username') if user_data else None
+            if not username:
+                raise UserEntityTypeError()
+            identifier = self.normalize_identifier(username)
+            if identifier is None:
+                raise UserEntityTypeError()
+            entity = await self.telegram.client.get_entity(identifier)
+            if not isinstance(entity, User):
+                raise UserEntityTypeError()
+        await self.save_entities([entity])
         return entity
 
+    def invalidate_channel(self, channel_id: int) -> None:
+        self.channel_entities.invalidate(channel_id)
+
+    def invalidate_user(self, user_id: int) -> None:
+        self.user_entities.invalidate(user_id)
+
+    def cache_stats(self) -> dict[str, dict[str, int]]:
+        return {
+            'channel_entities': self.channel_entities.stats(),
+            'user_entities': self.user_entities.stats(),
+        }
+
+    async def get_stored_input_peer(
+        self,
+        entity_id: int,
+        peer_types: list[str],
+    ) -> InputPeerChannel | InputPeerChat | InputPeerUser | None:
+        stored = await self.storage.entities.get(entity_id, peer_types)
+        if not stored:
+            return None
+        if stored['peer_type'] == 'channel':
+            return InputPeerChannel(stored['id'], stored['access_hash'])
+        if stored['peer_type'] == 'chat':
+            return InputPeerChat(stored['id'])
+        return InputPeerUser(stored['id'], stored['access_hash'])
+
+    async def get_stored_entity(
+        self,
+        entity_id: int,
+        peer_types: list[str],
+    ) -> Channel | Chat | User | None:
+        input_peer = await self.get_stored_input_peer(entity_id, peer_types)
+        if input_peer is None:
+            return None
+        return await self.safe_get_entity(input_peer)
+
+    async def save_entities(self, entities: list[Any]) -> None:
+        stored = [
+            stored_entity
+            for stored_entity in map(self.format_entity, entities)
+            if stored_entity is not None
+        ]
+        await self.storage.entities.upsert_many(stored)
+
     async def import_dialogs(self) -> list[dict[str, Any]]:
         dialogs = await self.telegram.client.get_dialogs()
+        await self.save_entities([dialog.entity for dialog in dialogs])
         saved = []
         for dialog in dialogs:
             entity = dialog.entity
@@ -144,117 +222,193 @@ class Mediator:
         date_from: datetime,
         date_to: datetime,
         channel_ids: list[int] | None = None,
+        concurrency: int = REFRESH_MESSAGES_CONCURRENCY,
+        incremental: bool = False,
+        edit_lookback: timedelta | None = None,
+        batch_size: int = REFRESH_MESSAGES_BATCH_SIZE,
+        queue_size: int = REFRESH_MESSAGES_QUEUE_SIZE,
+        lean: bool = MESSAGES_LEAN_INGEST,
+        progress: ProgressCallback | None = None,
     ) -> dict[str, Any]:
         if channel_ids:
             channels = await self.storage.channels.get_by_ids(channel_ids)
         else:
             channels = await self.storage.channels.list_all()
-        message_batch_size = 200
-        messages_total = 0
-        messages_created = 0
-        messages_updated = 0
-        channel_stats: list[dict[str, Any]] = []
+        semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+        async def refresh_one(channel: dict[str, Any]) -> dict[str, Any] | None:
+            async with semaphore:
+                channel_stat = await self._refresh_channel_messages(
+                    channel,
+                    date_from,
+                    date_to,
+                    incremental,
+                    edit_lookback,
+                    batch_size,
+                    queue_size,
+                    lean,
+                    progress,
+                )
+            if progress and channel_stat:
+                await progress(channel_stat['channel_id'], {**channel_stat, 'done': True})
+            return channel_stat
+
+        with background_priority():
+            results = await asyncio.gather(
+                *(refresh_one(channel) for channel in channels)
+            )
+        channel_stats = [stat for stat in results if stat is not None]
+        channel_stats.sort(key=lambda item: item['channel_id'])
+        return {
+            'total': sum(stat['total'] for stat in channel_stats),
+            'created': sum(stat['created'] for stat in channel_stats),
+            'updated': sum(stat['updated'] for stat in channel_stats),
+            'channels': channel_stats,
+        }
+
+    async def _refresh_channel_messages(
+        self,
+        channel: dict[str, Any],
+        date_from: datetime,
+        date_to: datetime,
+        incremental: bool = False,
+        edit_lookback: timedelta | None = None,
+        batch_size: int = REFRESH_MESSAGES_BATCH_SIZE,
+        queue_size: int = REFRESH_MESSAGES_QUEUE_SIZE,
+        lean: bool = MESSAGES_LEAN_INGEST,
+        progress: ProgressCallback | None = None,
+    ) -> dict[str, Any] | None:
+        channel_id = self._safe_int(channel.get('id'))
+        if channel_id is None:
+            return None
+        channel_title = channel.get('title')
+        if channel_title is not None:
+            channel_title = str(channel_title)
+        channel_stat = {
+            'channel_id': channel_id,
+            'channel_title': channel_title,
+            'total': 0,
+            'created': 0,
+            'updated': 0,
+        }
 
         def to_count(value: Any) -> int:
             normalized = self._safe_int(value)
             return normalized if normalized is not None else 0
 
-        def apply_upsert_stats(stats: dict[str, int]) -> tuple[int, int, int]:
-            processed = to_count(stats.get('processed'))
-            upserted = to_count(stats.get('upserted'))
-            modified = to_count(stats.get('modified'))
-            nonlocal messages_total
-            nonlocal messages_created
-            nonlocal messages_updated
-            messages_total += processed
-            messages_created += upserted
-            messages_updated += modified
-            return processed, upserted, modified
-
-        for channel in channels:
-            channel_id = self._safe_int(channel.get('id'))
-            if channel_id is None:
-                continue
-            channel_title = channel.get('title')
-            if channel_title is not None:
-                channel_title = str(channel_title)
-            channel_total = 0
-            channel_created = 0
-            channel_updated = 0
-
-            def apply_channel_upsert_stats(stats: dict[str, int]) -> None:
-                nonlocal channel_total
-                nonlocal channel_created
-                nonlocal channel_updated
-                processed, upserted, modified = apply_upsert_stats(stats)
-                channel_total += processed
-                channel_created += upserted
-                channel_updated += modified
-
-            async def flush_batch(batch: list[dict[str, Any]]) -> None:
-                if not batch:
-                    return
-                stats = await self.storage.messages.upsert_many(channel_id, batch)
-                apply_channel_upsert_stats(stats)
-                batch.clear()
+        try:
+            entity = await self.get_channel_input_peer(channel_id)
+        except Exception:
+            logger.exception(
+                'Failed to resolve channel entity for refresh (channel_id=%s)',
+                channel_id,
+            )
+            return channel_stat
+        started_at = datetime.now(timezone.utc)
+        fetch_failed = False
+        newest_message: tuple[int, datetime] | None = None
+        # Bounded queue gives backpressure: fetching pauses while the writer is queue_size batches behind.
+        queue: asyncio.Queue[list[dict[str, Any]] | None] = asyncio.Queue(
+            maxsize=max(queue_size, 1),
+        )
 
+        async def fetch_batches(min_id: int, fetch_from: datetime) -> None:
+            nonlocal fetch_failed
+            nonlocal newest_message
+            message_batch: list[dict[str, Any]] = []
             try:
-                entity = await self.resolve_channel_entity(channel)
-            except Exception:
-                logger.exception(
-                    'Failed to resolve channel entity for refresh (channel_id=%s)',
-                    channel_id,
-                )
-                channel_stats.append(
-                    {
-                        'channel_id': channel_id,
-                        'channel_title': channel_title,
-                        'total': 0,
-                        'created': 0,
-                        'updated': 0,
-                    }
-                )
-                continue
-            try:
-                message_batch: list[dict[str, Any]] = []
                 async for message in self.telegram.client.iter_messages(
                     entity,
                     offset_date=date_to,
+                    min_id=min_id,
                 ):
-                    if message.date < date_from:
+                    if message.date < fetch_from:
                         break
-                    message_data = message.to_dict()
-                    if not message_data:
-                        continue
-                    message_data = self._sanitize_message_payload(message_data)
+                    if newest_message is None or message.id > newest_message[0]:
+                        newest_message = (message.id, message.date)
+                    message_data = self.message_payload(message, lean)
                     if not message_data:
                         continue
                     message_data['date'] = message.date
                     message_batch.append(message_data)
-                    if len(message_batch) >= message_batch_size:
-                        await flush_batch(message_batch)
-                await flush_batch(message_batch)
+                    if len(message_batch) >= max(batch_size, 1):
+                        await queue.put(message_batch)
+                        message_batch = []
             except Exception:
+                # Already fetched messages are still written before the refresh is reported as failed.
+                fetch_failed = True
                 logger.exception(
-                    'Failed to refresh messages for channel (channel_id=%s)',
+                    'Failed to fetch messages for channel (channel_id=%s)',
                     channel_id,
                 )
-            channel_stats.append(
-                {
-                    'channel_id': channel_id,
-                    'channel_title': channel_title,
-                    'total': channel_total,
-                    'created': channel_created,
-                    'updated': channel_updated,
-                }
+            if message_batch:
+                await queue.put(message_batch)
+            await queue.put(None)
+
+        async def write_batches() -> None:
+            while (batch := await queue.get()) is not None:
+                stats = await self.storage.messages.upsert_many(channel_id, batch)
+                channel_stat['total'] += to_count(stats.get('processed'))
+                channel_stat['created'] += to_count(stats.get('upserted'))
+                channel_stat['updated'] += to_count(stats.get('modified'))
+                if progress:
+                    await progress(channel_id, {**channel_stat, 'done': False})
+
+        try:
+            mark = await self.storage.message_marks.get(channel_id)
+            fetch_from = date_from
+            min_id = 0
+            covered = mark is not None and mark['synced_from'] <= date_from <= mark['synced_to']
+            if incremental and covered and mark['message_id'] is not None:
+                if edit_lookback:
+                    fetch_from = max(date_from, mark['message_date'] - edit_lookback)
+                else:
+                    min_id = mark['message_id']
+            async with asyncio.TaskGroup() as group:
+                group.create_task(fetch_batches(min_id, fetch_from))
+                group.create_task(write_batches())
+            if not fetch_failed:
+                await self._save_message_mark(
+                    channel_id,
+                    mark,
+                    date_from,
+                    min(date_to, started_at),
+                    newest_message,
+                )
+        except Exception:
+            logger.exception(
+                'Failed to refresh messages for channel (channel_id=%s)',
+                channel_id,
             )
-        channel_stats.sort(key=lambda item: item['channel_id'])
-        return {
-            'total': messages_total,
-            'created': messages_created,
-            'updated': messages_updated,
-            'channels': channel_stats,
-        }
+        return channel_stat
+
+    async def _save_message_mark(
+        self,
+        channel_id: int,
+        mark: dict[str, Any] | None,
+        synced_from: datetime,
+        synced_to: datetime,
+        newest_message: tuple[int, datetime] | None,
+    ) -> None:
+        if synced_to < synced_from:
+            return
+        # Marks describe a contiguous fetched range, so only overlapping ranges are merged.
+        if mark is not None and synced_from <= mark['synced_to'] and synced_to >= mark['synced_from']:
+            synced_from = min(synced_from, mark['synced_from'])
+            synced_to = max(synced_to, mark['synced_to'])
+            if mark['message_id'] is not None and (
+                newest_message is None or mark['message_id'] > newest_message[0]
+            ):
+                newest_message = (mark['message_id'], mark['message_date'])
+        await self.storage.message_marks.upsert(
+            {
+                'channel_id': channel_id,
+                'synced_from': synced_from,
+                'synced_to': synced_to,
+                'message_id': newest_message[0] if newest_message else None,
+                'message_date': newest_message[1] if newest_message else None,
+            }
+        )
 
     async def render_messages(
         self,
@@ -262,22 +416,34 @@ class Mediator:
         date_from: datetime,
         date_to: datetime,
     ) -> list[str]:
-        messages = await self.storage.messages.list_by_channel_and_date(
+        messages = await self._load_rendered_messages(channel_id, date_from, date_to)
+        return self._with_format_hint(messages)
+
+    async def _load_rendered_messages(
+        self,
+        channel_id: int,
+        date_from: datetime,
+        date_to: datetime,
+        after_message_id: int | None = None,
+        reply_context: bool = True,
+    ) -> list[dict[str, Any]]:
+        messages = await self.storage.messages.list_rendered_by_channel_and_date(
             channel_id,
             date_from,
             date_to,
+            after_message_id,
         )
-        messages = await self._extend_messages_with_missing_replies(
-            channel_id,
-            messages,
-        )
-        user_ids = self._collect_message_user_ids(messages)
-        usernames = await self._get_usernames_by_ids(user_ids)
-        rendered: list[str] = []
-        for message in messages:
-            line = self._format_message_line(message, usernames)
-            if line:
-                rendered.append(line)
+        if reply_context:
+            messages = await self._extend_messages_with_missing_replies(
+                channel_id,
+                messages,
+            )
+        await self._render_stale_messages(channel_id, messages)
+        return messages
+
+    @staticmethod
+    def _with_format_hint(messages: list[dict[str, Any]]) -> list[str]:
+        rendered = [message['rendered_line'] for message in messages if message['rendered_line']]
         if not rendered:
             return []
         format_hint = (
@@ -286,26 +452,53 @@ class Mediator:
         )
         return [format_hint, *rendered]
 
+    async def _render_stale_messages(
+        self,
+        channel_id: int,
+        messages: list[dict[str, Any]],
+    ) -> None:
+        stale = {
+            message['id']: message
+            for message in messages
+            if message['rendered_line'] is None
+        }
+        if not stale:
+            return
+        details = await self.storage.messages.list_by_channel_and_ids(
+            channel_id,
+            list(stale),
+        )
+        usernames = await self.storage.users.get_usernames(
+            list(self._collect_message_user_ids(details)),
+        )
+        rendered: list[dict[str, Any]] = []
+        for detail in details:
+            message = stale.get(self._safe_int(detail.get('id')))
+            if message is None:
+                continue
+            # Messages without text are stored as an empty line so they are not rendered again.
+            message['rendered_line'] = self._format_message_line(detail, usernames) or ''
+            message['username'] = usernames.get(self._get_message_user_id(detail))
+            rendered.append(message)
+        await self.storage.messages.save_rendered_lines(channel_id, rendered)
+
     async def analyze_rendered_messages(
         self,
         prompt_id: int,
         messages: list[str],
+        use_cache: bool = True,
+        map_reduce: bool = False,
+        events: EventCallback | None = None,
     ) -> dict[str, Any]:
-        prompt, prompt_text = await self._get_analysis_prompt(prompt_id)
         normalized_messages = self._normalize_message_lines(messages)
         if not normalized_messages:
             raise AppException('No rendered messages to analyze')
-        analysis = await self._analyze_messages_with_chunking(
-            prompt_id=prompt_id,
-            prompt_text=prompt_text,
-            messages=normalized_messages,
-            analysis_scope='rendered messages',
+        prompt, run = await self._start_analysis_run(
+            prompt_id,
+            'rendered-messages',
+            {'use_cache': use_cache, 'map_reduce': map_reduce},
         )
-        return {
-            'prompt_id': prompt_id,
-            'prompt_title': str(prompt.get('title') or prompt_id),
-            'analysis': analysis,
-        }
+        return await self._analyze_rendered_run(prompt, run, normalized_messages, events)
 
     async def analyze_selected_channels(
         self,
@@ -313,8 +506,13 @@ class Mediator:
         channel_ids: list[int],
         date_from: datetime,
         date_to: datetime,
+        use_cache: bool = True,
+        map_reduce: bool = False,
+        incremental: bool = False,
+        reply_context: bool = True,
+        progress: ProgressCallback | None = None,
+        events: EventCallback | None = None,
     ) -> dict[str, Any]:
-        prompt, prompt_text = await self._get_analysis_prompt(prompt_id)
         normalized_channel_ids: list[int] = []
         seen_channel_ids: set[int] = set()
         for channel_id in channel_ids or []:
@@ -327,97 +525,388 @@ class Mediator:
             normalized_channel_ids.append(normalized_channel_id)
         if not normalized_channel_ids:
             raise AppException('No channels selected for analysis')
-        channel_reports: list[tuple[int, str]] = []
-        for channel_id in normalized_channel_ids:
-            rendered_messages = await self.render_messages(
-                channel_id,
-                date_from,
-                date_to,
-            )
-            normalized_messages = self._normalize_message_lines(rendered_messages)
-            if not normalized_messages:
-                continue
-            analysis = await self._analyze_messages_with_chunking(
-                prompt_id=prompt_id,
-                prompt_text=prompt_text,
-                messages=normalized_messages,
-                analysis_scope=f'channel {channel_id}',
-            )
-            if analysis:
-                channel_reports.append((channel_id, analysis))
-        if not channel_reports:
-            raise AppException('No rendered messages to analyze for selected channels')
-        if len(channel_reports) == 1:
-            analysis_text = channel_reports[0][1]
-        else:
-            analysis_text = '\n\n'.join(
-                f'### Channel {channel_id}\n{analysis}'
-                for channel_id, analysis in channel_reports
-            )
-        return {
-            'prompt_id': prompt_id,
-            'prompt_title': str(prompt.get('title') or prompt_id),
-            'analysis': analysis_text,
-        }
+        prompt, run = await self._start_analysis_run(
+            prompt_id,
+            'selected-channels',
+            {
+                'channel_ids': normalized_channel_ids,
+                'date_from': date_from,
+                'date_to': date_to,
+                'use_cache': use_cache,
+                'map_reduce': map_reduce,
+                'incremental': incremental,
+                'reply_context': reply_context,
+            },
+        )
+        return await self._analyze_selected_run(prompt, run, progress, events)
 
-    async def _get_analysis_prompt(
+    async def resume_analysis_run(
+        self,
+        run_id: UUID,
+        progress: ProgressCallback | None = None,
+        events: EventCallback | None = None,
+    ) -> dict[str, Any]:
+        run = await self.storage.analysis_runs.get(run_id)
+        if not run:
+            raise AnalysisRunNotFoundError()
+        if run['status'] == 'completed':
+            return run['result']
+        if run_id in self.active_runs:
+            raise AppException('Analysis run is already in progress')
+        # Claimed before the first await, so a concurrent resume of the same run is rejected.
+        self.active_runs.add(run_id)
+        try:
+            prompt = await self.storage.prompts.get(run['prompt_id'])
+            if not prompt:
+                raise PromptNotFoundError()
+            await self.storage.analysis_runs.restart(run_id)
+            if run['kind'] == 'rendered-messages':
+                return await self._analyze_rendered_run(prompt, run, [], events)
+            return await self._analyze_selected_run(prompt, run, progress, events)
+        finally:
+            self.active_runs.discard(run_id)
+
+    async def _start_analysis_run(
         self,
         prompt_id: int,
-    ) -> tuple[dict[str, Any], str]:
+        kind: str,
+        params: dict[str, Any],
+    ) -> tuple[dict[str, Any], dict[str, Any]]:
         prompt = await self.storage.prompts.get(prompt_id)
         if not prompt:
             raise PromptNotFoundError()
         prompt_text = str(prompt.get('text') or '').strip()
         if not prompt_text:
             raise AppException('Prompt text is empty')
-        return prompt, prompt_text
+        run = await self.storage.analysis_runs.create(uuid4(), prompt_id, prompt_text, kind, params)
+        self.active_runs.add(run['id'])
+        return prompt, run
 
-    async def _analyze_messages_with_chunking(
+    async def _finish_analysis_run(
         self,
-        prompt_id: int,
-        prompt_text: str,
+        prompt: dict[str, Any],
+        run: dict[str, Any],
+        analyze: Callable[[], Awaitable[str]],
+        events: EventCallback | None = None,
+    ) -> dict[str, Any]:
+        run_id = run['id']
+        try:
+            if events:
+                await events('run', {'run_id': str(run_id)})
+            analysis = await analyze()
+            result = {
+                'prompt_id': run['prompt_id'],
+                'prompt_title': str(prompt.get('title') or run['prompt_id']),
+                'analysis': analysis,
+                'run_id': str(run_id),
+                'usage': await self.storage.analysis_usage.totals_by_run(run_id),
+            }
+            await self.storage.analysis_runs.finish(run_id, 'completed', result=result)
+        except asyncio.CancelledError:
+            await self.storage.analysis_runs.finish(run_id, 'interrupted')
+            raise
+        except AppException as exc:
+            await self.storage.analysis_runs.finish(run_id, 'failed', error=exc.detail)
+            raise
+        except Exception:
+            await self.storage.analysis_runs.finish(run_id, 'failed', error='Analysis failed')
+            raise
+        finally:
+            self.active_runs.discard(run_id)
+        return result
+
+    async def _analyze_rendered_run(
+        self,
+        prompt: dict[str, Any],
+        run: dict[str, Any],
+        messages: list[str],
+        events: EventCallback | None = None,
+    ) -> dict[str, Any]:
+        analysis_scope = 'rendered messages'
+
+        async def analyze() -> str:
+            chunks = await self._plan_analysis_chunks(run, analysis_scope, messages)
+            return await self._analyze_chunks(run, chunks, analysis_scope, events)
+
+        return await self._finish_analysis_run(prompt, run, analyze, events)
+
+    async def _analyze_selected_run(
+        self,
+        prompt: dict[str, Any],
+        run: dict[str, Any],
+        progress: ProgressCallback | None = None,
+        events: EventCallback | None = None,
+    ) -> dict[str, Any]:
+        params = run['params']
+        channel_ids: list[int] = params['channel_ids']
+        date_from = normalize_datetime(params['date_from'])
+        date_to = normalize_datetime(params['date_to'])
+        # Rendering runs ahead of analysis, so the next channels are ready while DeepSeek works on the current ones.
+        render_semaphore = asyncio.Semaphore(max(ANALYSIS_RENDER_CONCURRENCY, 1))
+        analysis_semaphore = asyncio.Semaphore(max(ANALYSIS_CHANNEL_CONCURRENCY, 1))
+
+        marks: dict[int, dict[str, Any]] = {}
+        if params['incremental']:
+            marks = await self.storage.analysis_marks.list_by_channels(
+                run['prompt_id'],
+                channel_ids,
+            )
+
+        async def analyze_channel(channel_id: int) -> str | None:
+            analysis_scope = f'channel {channel_id}'
+            after_message_id = marks[channel_id]['message_id'] if channel_id in marks else None
+            async with render_semaphore:
+                messages = await self._load_rendered_messages(
+                    channel_id,
+                    date_from,
+                    date_to,
+                    after_message_id,
+                    params['reply_context'],
+                )
+            chunks = await self._plan_analysis_chunks(
+                run,
+                analysis_scope,
+                self._with_format_hint(messages),
+            )
+            if not chunks:
+                if progress:
+                    await progress(channel_id, {'messages': 0, 'analysis': None})
+                return None
+            async with analysis_semaphore:
+                analysis = await self._analyze_chunks(run, chunks, analysis_scope, events)
+            if params['incremental']:
+                # Only planned messages advance the watermark; older reply context and
+                # messages that arrived after the plan of a resumed run do not.
+                planned_lines = {line for chunk in chunks for line in chunk}
+                newest = max(
+                    (
+                        message for message in messages
+                        if message['rendered_line'] in planned_lines and (
+                            after_message_id is None or message['id'] > after_message_id
+                        )
+                    ),
+                    key=lambda message: message['id'],
+                    default=None,
+                )
+                if newest:
+                    await self.storage.analysis_marks.upsert(
+                        run['prompt_id'],
+                        channel_id,
+                        newest['id'],
+                        newest['date'],
+                    )
+            if progress:
+                await progress(
+                    channel_id,
+                    {'messages': sum(len(chunk) - 1 for chunk in chunks), 'analysis': analysis},
+                )
+            return analysis
+
+        async def analyze() -> str:
+            analyses = await gather_or_cancel(
+                analyze_channel(channel_id) for channel_id in channel_ids
+            )
+            channel_reports = [
+                (channel_id, analysis)
+                for channel_id, analysis in zip(channel_ids, analyses)
+                if analysis
+            ]
+            if not channel_reports:
+                raise AppException('No rendered messages to analyze for selected channels')
+            if len(channel_reports) == 1:
+                return channel_reports[0][1]
+            if params['map_reduce']:
+                return await self._reduce_analyses(
+                    run,
+                    [analysis for _, analysis in channel_reports],
+                    'selected channels',
+                    events,
+                )
+            return '\n\n'.join(
+                f'### Channel {channel_id}\n{analysis}'
+                for channel_id, analysis in channel_reports
+            )
+
+        return await self._finish_analysis_run(prompt, run, analyze, events)
+
+    async def _plan_analysis_chunks(
+        self,
+        run: dict[str, Any],
+        analysis_scope: str,
         messages: list[str],
+    ) -> list[list[str]]:
+        # A resumed run keeps its original plan, so completed chunks line up with their checkpoints.
+        planned = await self.storage.analysis_runs.list_chunk_lines(run['id'], analysis_scope, 0)
+        return planned or self._split_analysis_message_chunks(messages)
+
+    async def _analyze_chunks(
+        self,
+        run: dict[str, Any],
+        chunks: list[list[str]],
         analysis_scope: str,
+        events: EventCallback | None = None,
     ) -> str:
-        chunks = self._split_analysis_message_chunks(
-            messages,
-            self._MAX_ANALYSIS_CHUNK_SIZE,
-        )
         if not chunks:
             raise AppException('No rendered messages to analyze')
-        total_chunks = len(chunks)
-        analyses: list[str] = []
-        for index, chunk in enumerate(chunks, start=1):
-            try:
-                analysis = await self.deepseek.analyze_messages(
-                    prompt_text,
-                    chunk,
-                )
-            except Exception:
-                logger.exception(
-                    'Failed to analyze %s (prompt_id=%s, chunk=%s/%s)',
+        analyses = await self._run_analysis_batches(
+            run,
+            run['prompt_text'],
+            chunks,
+            analysis_scope,
+            events,
+        )
+        if len(analyses) == 1:
+            return analyses[0]
+        if run['params']['map_reduce']:
+            return await self._reduce_analyses(run, analyses, analysis_scope, events)
+        total_chunks = len(analyses)
+        return '\n\n'.join(
+            f'--- CHUNK {index}/{total_chunks} ---\n{analysis}'
+            for index, analysis in enumerate(analyses, start=1)
+        )
+
+    async def _reduce_analyses(
+        self,
+        run: dict[str, Any],
+        analyses: list[str],
+        analysis_scope: str,
+        events: EventCallback | None = None,
+    ) -> str:
+        reduce_prompt = f'{run["prompt_text"]}\n\n{ANALYSIS_REDUCE_INSTRUCTION}'
+        level = 0
+        while len(analyses) > 1:
+            level += 1
+            groups = group_for_reduce(
+                analyses,
+                ANALYSIS_REDUCE_FAN_IN,
+                ANALYSIS_CHUNK_BUDGET,
+                SIZE_ESTIMATORS[ANALYSIS_CHUNK_ESTIMATOR],
+            )
+            reduced = iter(
+                await self._run_analysis_batches(
+                    run,
+                    reduce_prompt,
+                    [group for group in groups if len(group) > 1],
                     analysis_scope,
+                    events,
+                    level,
+                )
+            )
+            # A trailing group with a single result is carried to the next level as is.
+            analyses = [next(reduced) if len(group) > 1 else group[0] for group in groups]
+        return analyses[0]
+
+    async def _run_analysis_batches(
+        self,
+        run: dict[str, Any],
+        prompt_text: str,
+        batches: list[list[str]],
+        analysis_scope: str,
+        events: EventCallback | None = None,
+        level: int = 0,
+    ) -> list[str]:
+        run_id = run['id']
+        prompt_id = run['prompt_id']
+        use_cache = run['params']['use_cache']
+        total_batches = len(batches)
+        checkpoints = await self.storage.analysis_runs.save_chunks(run_id, analysis_scope, level, batches)
+        semaphore = asyncio.Semaphore(max(ANALYSIS_CHUNK_CONCURRENCY, 1))
+        stored = False
+
+        async def analyze_batch(index: int, batch: list[str]) -> str:
+            nonlocal stored
+            boundary = {
+                'scope': analysis_scope,
+                'level': level,
+                'chunk': index,
+                'chunks': total_batches,
+            }
+            cache_key = self.storage.analysis_cache.make_key(self.deepseek.model, prompt_text, batch)
+            # A checkpointed chunk has already been applied by an earlier attempt of this run.
+            analysis = checkpoints.get(index)
+            if analysis is None and use_cache:
+                analysis = await self.storage.analysis_cache.get(cache_key)
+                if analysis is not None:
+                    await self.storage.analysis_runs.complete_chunk(run_id, analysis_scope, level, index, analysis)
+            if analysis is not None:
+                if events:
+                    await events('chunk_start', {**boundary, 'cached': True})
+                    await events('chunk_end', {**boundary, 'analysis': analysis})
+                return analysis
+            async with semaphore:
+                if events:
+                    await events('chunk_start', {**boundary, 'cached': False})
+                try:
+                    if events:
+                        analysis, usage = await self._stream_chunk_analysis(prompt_text, batch, boundary, events)
+                    else:
+                        analysis, usage = await self.deepseek.analyze_messages(
+                            prompt_text,
+                            batch,
+                        )
+                except DeepSeekUnavailableError:
+                    raise
+                except Exception:
+                    logger.exception(
+                        'Failed to analyze %s (run_id=%s, level=%s, chunk=%s/%s)',
+                        analysis_scope,
+                        run_id,
+                        level,
+                        index,
+                        total_batches,
+                    )
+                    raise AppException('DeepSeek analysis request failed')
+            if usage:
+                await self.storage.analysis_usage.add(
+                    run_id,
                     prompt_id,
+                    self.deepseek.model,
+                    analysis_scope,
+                    level,
                     index,
-                    total_chunks,
+                    usage,
                 )
-                raise AppException('DeepSeek analysis request failed')
             if not analysis:
                 raise AppException('DeepSeek returned an empty analysis')
-            await self._save_user_conclusions_from_analysis(analysis)
-            analyses.append(analysis)
-        if len(analyses) == 1:
-            return analyses[0]
-        return '\n\n'.join(
-            f'--- CHUNK {index}/{total_chunks} ---\n{analysis}'
-            for index, analysis in enumerate(analyses, start=1)
+            if level:
+                # Reduced results only restate conclusions that the map level has already saved.
+                self._require_user_conclusions(analysis)
+            else:
+                # Conclusions are saved before caching, so a cached completion has already been applied.
+                await self._save_user_conclusions_from_analysis(analysis)
+            await self.storage.analysis_cache.put(cache_key, self.deepseek.model, analysis)
+            await self.storage.analysis_runs.complete_chunk(run_id, analysis_scope, level, index, analysis)
+            stored = True
+            if events:
+                await events('chunk_end', {**boundary, 'analysis': analysis})
+            return analysis
+
+        analyses = await gather_or_cancel(
+            analyze_batch(index, batch)
+            for index, batch in enumerate(batches, start=1)
         )
+        if stored:
+            await self.storage.analysis_cache.prune()
+        return analyses
 
-    def _split_analysis_message_chunks(
+    async def _stream_chunk_analysis(
         self,
-        messages: list[str],
-        max_chunk_size: int,
-    ) -> list[list[str]]:
+        prompt_text: str,
+        chunk: list[str],
+        boundary: dict[str, Any],
+        events: EventCallback,
+    ) -> tuple[str, dict[str, int] | None]:
+        parts: list[str] = []
+        usage = None
+        async for text, chunk_usage in self.deepseek.stream_analysis(prompt_text, chunk):
+            if chunk_usage:
+                usage = chunk_usage
+            if text:
+                parts.append(text)
+                await events('token', {**boundary, 'text': text})
+        return ''.join(parts).strip(), usage
+
+    def _split_analysis_message_chunks(self, messages: list[str]) -> list[list[str]]:
         normalized_messages = self._normalize_message_lines(messages)
         if not normalized_messages:
             return []
@@ -428,36 +917,14 @@ class Mediator:
             message_lines = message_lines[1:]
         if not message_lines:
             return [normalized_messages]
-        return self._split_analysis_message_chunks_recursive(
+        return pack_lines(
             message_lines,
+            ANALYSIS_CHUNK_BUDGET,
+            SIZE_ESTIMATORS[ANALYSIS_CHUNK_ESTIMATOR],
             format_hint,
-            max_chunk_size,
+            parse_message_line_link if ANALYSIS_KEEP_REPLY_THREADS else None,
         )
 
-    def _split_analysis_message_chunks_recursive(
-        self,
-        message_lines: list[str],
-        format_hint: str | None,
-        max_chunk_size: int,
-    ) -> list[list[str]]:
-        chunk = [*([format_hint] if format_hint else []), *message_lines]
-        if len('\n'.join(chunk)) <= max_chunk_size or len(message_lines) <= 1:
-            return [chunk]
-        midpoint = len(message_lines) // 2
-        if midpoint <= 0 or midpoint >= len(message_lines):
-            return [chunk]
-        left_chunks = self._split_analysis_message_chunks_recursive(
-            message_lines[:midpoint],
-            format_hint,
-            max_chunk_size,
-        )
-        right_chunks = self._split_analysis_message_chunks_recursive(
-            message_lines[midpoint:],
-            format_hint,
-            max_chunk_size,
-        )
-        return [*left_chunks, *right_chunks]
-
     @staticmethod
     def _normalize_message_lines(messages: list[str] | None) -> list[str]:
         return [
@@ -466,13 +933,17 @@ class Mediator:
             if message is not None and str(message).strip()
         ]
 
-    async def _save_user_conclusions_from_analysis(self, analysis: str) -> None:
+    def _require_user_conclusions(self, analysis: str) -> list[dict[str, Any]]:
         conclusions = self._extract_user_conclusions(analysis)
         if not conclusions:
             raise AppException(
                 'DeepSeek returned invalid analysis format. '
                 'Expected a JSON list of objects with id.'
             )
+        return conclusions
+
+    async def _save_user_conclusions_from_analysis(self, analysis: str) -> None:
+        conclusions = self._require_user_conclusions(analysis)
         try:
             await self.storage.users.upsert_conclusions(conclusions)
         except Exception:
@@ -559,38 +1030,18 @@ class Mediator:
     ) -> list[dict[str, Any]]:
         if not messages:
             return []
-        message_by_id: dict[int, dict[str, Any]] = {}
-        ordered: list[dict[str, Any]] = []
-        for message in messages:
-            message_id = self._safe_int(message.get('id'))
-            if message_id is None:
-                continue
-            if message_id in message_by_id:
-                continue
-            message_by_id[message_id] = message
-            ordered.append(message)
-        pending_reply_ids: set[int] = set()
-        for message in ordered:
-            reply_id = self._get_reply_message_id(message)
-            if reply_id is not None and reply_id not in message_by_id:
-                pending_reply_ids.add(reply_id)
+        message_by_id = {message['id']: message for message in messages}
+        pending_reply_ids = {
+            message['reply_to_id']
+            for message in messages
+            if message['reply_to_id'] is not None and message['reply_to_id'] not in message_by_id
+        }
         while pending_reply_ids:
-            loaded_reply_ids: set[int] = set()
-            reply_messages = await self.storage.messages.list_by_channel_and_ids(
+            reply_messages = await self.storage.messages.list_rendered_by_channel_and_ids(
                 channel_id,
                 list(pending_reply_ids),
             )
-            for reply_message in reply_messages:
-                reply_id = self._safe_int(reply_message.get('id'))
-                if reply_id is None:
-                    continue
-                loaded_reply_ids.add(reply_id)
-                if reply_id in message_by_id:
-                    continue
-                message_by_id[reply_id] = reply_message
-                ordered.append(reply_message)
-
-            missing_in_storage = pending_reply_ids - loaded_reply_ids
+            missing_in_storage = pending_reply_ids - {message['id'] for message in reply_messages}
             if missing_in_storage:
                 fetched_reply_messages = await self._fetch_channel_messages_by_ids(
                     channel_id,
@@ -602,34 +1053,27 @@ class Mediator:
                             channel_id,
                             fetched_reply_messages,
                         )
+                        reply_messages.extend(
+                            await self.storage.messages.list_rendered_by_channel_and_ids(
+                                channel_id,
+                                [message['id'] for message in fetched_reply_messages],
+                            )
+                        )
                     except Exception:
                         logger.exception(
                             'Failed to cache fetched reply messages (channel_id=%s)',
                             channel_id,
                         )
-                for reply_message in fetched_reply_messages:
-                    reply_id = self._safe_int(reply_message.get('id'))
-                    if reply_id is None:
-                        continue
-                    loaded_reply_ids.add(reply_id)
-                    if reply_id in message_by_id:
-                        continue
-                    message_by_id[reply_id] = reply_message
-                    ordered.append(reply_message)
-
-            next_pending_reply_ids: set[int] = set()
-            for loaded_reply_id in loaded_reply_ids:
-                reply_message = message_by_id.get(loaded_reply_id)
-                if not isinstance(reply_message, dict):
-                    continue
-                nested_reply_id = self._get_reply_message_id(reply_message)
-                if nested_reply_id is None or nested_reply_id in message_by_id:
+            pending_reply_ids = set()
+            for reply_message in reply_messages:
+                if reply_message['id'] in message_by_id:
                     continue
-                next_pending_reply_ids.add(nested_reply_id)
-            if not next_pending_reply_ids:
-                break
-            pending_reply_ids = next_pending_reply_ids
-        return sorted(ordered, key=self._message_sort_key)
+                message_by_id[reply_message['id']] = reply_message
+                nested_reply_id = reply_message['reply_to_id']
+                if nested_reply_id is not None and nested_reply_id not in message_by_id:
+                    pending_reply_ids.add(nested_reply_id)
+            pending_reply_ids -= message_by_id.keys()
+        return sorted(message_by_id.values(), key=self._message_sort_key)
 
     async def _fetch_channel_messages_by_ids(
         self,
@@ -639,7 +1083,7 @@ class Mediator:
         if not message_ids:
             return []
         try:
-            entity = await self.get_channel_entity(channel_id)
+            entity = await self.get_channel_input_peer(channel_id)
         except Exception:
             logger.exception(
                 'Failed to resolve channel for missing replies (channel_id=%s)',
@@ -667,11 +1111,8 @@ class Mediator:
         for fetched_message in fetched_messages:
             if fetched_message is None:
                 continue
-            raw_message = fetched_message.to_dict()
-            if not raw_message:
-                continue
-            message = self._sanitize_message_payload(raw_message)
-            if not isinstance(message, dict):
+            message = self.message_payload(fetched_message, MESSAGES_LEAN_INGEST)
+            if not message:
                 continue
             message_id = self._safe_int(message.get('id'))
             if message_id is None:
@@ -698,28 +1139,14 @@ class Mediator:
                 user_ids.add(user_id)
         return user_ids
 
-    async def _get_usernames_by_ids(
+    async def refresh_user_message_stats(
         self,
-        user_ids: set[int],
-    ) -> dict[int, str]:
-        if not user_ids:
-            return {}
-        users = await self.storage.users.list_by_ids(list(user_ids))
-        usernames: dict[int, str] = {}
-        for user in users:
-            user_id = self._safe_int(user.get('id'))
-            if user_id is None:
-                continue
-            username = user.get('username')
-            if username:
-                usernames[user_id] = username
-        return usernames
-
-    async def refresh_user_message_stats(self) -> dict[str, int | list[str]]:
+        progress: ProgressCallback | None = None,
+    ) -> dict[str, int | list[str]]:
         stats = await self.storage.messages.aggregate_user_message_stats()
         user_ids: list[int] = []
         messages_total = 0
-        channel_ids: set[int] = set()
+        channel_totals: dict[int, dict[str, int]] = {}
 
         for entry in stats:
             user_id = entry.get('user_id')
@@ -744,10 +1171,15 @@ class Mediator:
                     channel_id = int(channel_id)
                 except (TypeError, ValueError):
                     continue
-                channel_ids.add(channel_id)
+                channel_total = channel_totals.setdefault(channel_id, {'users': 0, 'messages': 0})
+                channel_total['users'] += 1
+                channel_total['messages'] += self._safe_int(channel.get('messages_count')) or 0
+        if progress:
+            for channel_id, channel_total in channel_totals.items():
+                await progress(channel_id, channel_total)
         return {
             'users_updated': len(user_ids),
-            'channels_with_messages': len(channel_ids),
+            'channels_with_messages': len(channel_totals),
             'messages_total': messages_total,
             'errors': [],
         }
@@ -832,6 +1264,45 @@ class Mediator:
     def _normalize_message_text(value: Any) -> str:
         return normalize_message_text(value)
 
+    def message_payload(self, message: Message, lean: bool) -> dict[str, Any] | None:
+        if lean:
+            return self._project_message(message)
+        message_data = message.to_dict()
+        if not message_data:
+            return None
+        return self._sanitize_message_payload(message_data) or None
+
+    @staticmethod
+    def _project_message(message: Message) -> dict[str, Any]:
+        reply_to = message.reply_to
+        fwd_from = getattr(message, 'fwd_from', None)
+        media = getattr(message, 'media', None)
+        return {
+            '_': type(message).__name__,
+            'id': message.id,
+            'date': message.date,
+            'from_id': message.from_id.to_dict() if message.from_id else None,
+            'reply_to': {
+                '_': type(reply_to).__name__,
+                'reply_to_msg_id': getattr(reply_to, 'reply_to_msg_id', None),
+                'reply_to_top_id': getattr(reply_to, 'reply_to_top_id', None),
+            } if reply_to else None,
+            'fwd_from': {
+                '_': type(fwd_from).__name__,
+                'from_id': fwd_from.from_id.to_dict() if fwd_from.from_id else None,
+                'from_name': fwd_from.from_name,
+                'channel_post': fwd_from.channel_post,
+                'saved_from_peer': (
+                    fwd_from.saved_from_peer.to_dict() if fwd_from.saved_from_peer else None
+                ),
+                'saved_from_msg_id': fwd_from.saved_from_msg_id,
+            } if fwd_from else None,
+            'message': getattr(message, 'message', None),
+            'edit_date': getattr(message, 'edit_date', None),
+            'grouped_id': getattr(message, 'grouped_id', None),
+            'media': {'_': type(media).__name__} if media else None,
+        }
+
     @classmethod
     def _sanitize_message_payload(cls, value: Any) -> Any:
         if isinstance(value, dict):
@@ -943,6 +1414,7 @@ class Mediator:
 
         async def refresh_one(user_id: int) -> tuple[bool, str | None]:
             async with semaphore:
+                self.invalidate_user(user_id)
                 try:
                     entity, about = await self.get_user_details(user_id)
                     user_data = self.format_user(entity, about)
@@ -981,14 +1453,31 @@ class Mediator:
             return channel_id
         return int(f'-100{channel_id}')
 
-    async def safe_get_entity(self, identifier: str | int) -> Channel | Chat | User | None:
+    async def safe_get_entity(self, identifier: Any) -> Channel | Chat | User | None:
         try:
             return await self.telegram.client.get_entity(identifier)
-        except Exception:
+        except self._ENTITY_LOOKUP_ERRORS:
             return None
 
-    async def resolve_channel_entity(self, channel: dict[str, Any]) -> Channel | Chat:
-        return await self.get_channel_entity(channel['id'])
+    @staticmethod
+    def format_entity(entity: Any) -> dict[str, Any] | None:
+        # Access hashes of min entities are only valid together with the message they came with.
+        if getattr(entity, 'min', False):
+            return None
+        if isinstance(entity, Channel):
+            peer_type = 'channel'
+        elif isinstance(entity, Chat):
+            peer_type = 'chat'
+        elif isinstance(entity, User):
+            peer_type = 'user'
+        else:
+            return None
+        return {
+            'peer_type': peer_type,
+            'id': entity.id,
+            'access_hash': getattr(entity, 'access_hash', None),
+            'username': getattr(entity, 'username', None),
+        }
 
     def format_channel(self, entity: Channel | Chat) -> dict[str, Any]:
         channel_type = 'channel'
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import heapq
+import itertools
+import logging
+import time
+from contextvars import ContextVar
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+from typing import Iterator
+
+from telethon.errors import FloodWaitError
+
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE_PRIORITY = 0
+BACKGROUND_PRIORITY = 1
+
+request_priority: ContextVar[int] = ContextVar(
+    'telegram_request_priority',
+    default=INTERACTIVE_PRIORITY,
+)
+
+
+@contextlib.contextmanager
+def background_priority() -> Iterator[None]:
+    token = request_priority.set(BACKGROUND_PRIORITY)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self.waiters: list[tuple[int, int, asyncio.Future]] = []
+        self.dispatcher: asyncio.Task | None = None
+
+    def delay(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        delay = max(self.paused_until - now, 0.0)
+        if self.tokens < 1:
+            delay = max(delay, (1 - self.tokens) / self.rate)
+        return delay
+
+    def pause(self, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class TelegramScheduler:
+    def __init__(
+        self,
+        limits: dict[str, tuple[float, int]],
+        method_classes: dict[str, str],
+        flood_wait_max: int,
+        flood_wait_retries: int,
+    ) -> None:
+        self.buckets = {
+            name: TokenBucket(rate, burst)
+            for name, (rate, burst) in limits.items()
+        }
+        self.method_classes = method_classes
+        self.flood_wait_max = flood_wait_max
+        self.flood_wait_retries = flood_wait_retries
+        self.counters = {
+            name: {'calls': 0, 'throttled': 0, 'wait_seconds': 0.0, 'flood_waits': 0}
+            for name in limits
+        }
+        self.sequence = itertools.count()
+
+    def classify(self, request: Any) -> str:
+        if isinstance(request, list):
+            request = request[0] if request else None
+        method_class = self.method_classes.get(type(request).__name__, 'default')
+        return method_class if method_class in self.buckets else 'default'
+
+    async def call(self, request: Any, send: Callable[[], Awaitable[Any]]) -> Any:
+        method_class = self.classify(request)
+        counters = self.counters[method_class]
+        attempt = 0
+        while True:
+            await self.acquire(method_class)
+            counters['calls'] += 1
+            try:
+                return await send()
+            except FloodWaitError as exc:
+                counters['flood_waits'] += 1
+                attempt += 1
+                logger.warning(
+                    'Telegram flood wait (method_class=%s, request=%s, seconds=%s)',
+                    method_class,
+                    type(request).__name__,
+                    exc.seconds,
+                )
+                if exc.seconds > self.flood_wait_max or attempt > self.flood_wait_retries:
+                    raise
+                # Only this method class is paused; other Telegram calls keep flowing.
+                self.buckets[method_class].pause(exc.seconds)
+
+    async def acquire(self, method_class: str) -> None:
+        bucket = self.buckets[method_class]
+        if not bucket.waiters and bucket.delay() == 0:
+            bucket.tokens -= 1
+            return
+        counters = self.counters[method_class]
+        counters['throttled'] += 1
+        started = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(
+            bucket.waiters,
+            (request_priority.get(), next(self.sequence), future),
+        )
+        if bucket.dispatcher is None or bucket.dispatcher.done():
+            bucket.dispatcher = asyncio.create_task(self.dispatch(bucket))
+        try:
+            await future
+        finally:
+            counters['wait_seconds'] += time.monotonic() - started
+
+    async def dispatch(self, bucket: TokenBucket) -> None:
+        while bucket.waiters:
+            delay = bucket.delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            # Lower priority value wins, so interactive calls overtake queued background ones.
+            _, _, future = heapq.heappop(bucket.waiters)
+            if future.done():
+                continue
+            bucket.tokens -= 1
+            future.set_result(None)
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        now = time.monotonic()
+        return {
+            name: {
+                **self.counters[name],
+                'queued': len(bucket.waiters),
+                'paused_seconds': max(bucket.paused_until - now, 0.0),
+            }
+            for name, bucket in self.buckets.items()
+        }
@@ -1,8 +1,16 @@
 from datetime import datetime
+from datetime import timedelta
+from typing import Any
+from uuid import UUID
 
 from pydantic import BaseModel
 from pydantic import Field
 
+from .config import MESSAGES_LEAN_INGEST
+from .config import REFRESH_MESSAGES_BATCH_SIZE
+from .config import REFRESH_MESSAGES_CONCURRENCY
+from .config import REFRESH_MESSAGES_QUEUE_SIZE
+
 
 class ChannelCreate(BaseModel):
     value: str
@@ -36,6 +44,12 @@ class RefreshMessagesRequest(BaseModel):
     date_from: datetime
     date_to: datetime
     channel_ids: list[int] | None = None
+    concurrency: int = REFRESH_MESSAGES_CONCURRENCY
+    incremental: bool = False
+    edit_lookback: timedelta | None = None
+    batch_size: int = REFRESH_MESSAGES_BATCH_SIZE
+    queue_size: int = REFRESH_MESSAGES_QUEUE_SIZE
+    lean: bool = MESSAGES_LEAN_INGEST
 
 
 class RenderMessagesRequest(BaseModel):
@@ -67,6 +81,8 @@ class RenderMessagesResponse(BaseModel):
 class AnalyzeRenderedMessagesRequest(BaseModel):
     prompt_id: int
     messages: list[str] = Field(default_factory=list)
+    use_cache: bool = True
+    map_reduce: bool = False
 
 
 class AnalyzeSelectedChannelsRequest(BaseModel):
@@ -74,12 +90,26 @@ class AnalyzeSelectedChannelsRequest(BaseModel):
     channel_ids: list[int] = Field(default_factory=list)
     date_from: datetime
     date_to: datetime
+    use_cache: bool = True
+    map_reduce: bool = False
+    incremental: bool = False
+    reply_context: bool = True
+
+
+class AnalysisUsage(BaseModel):
+    calls: int
+    prompt_tokens: int
+    completion_tokens: int
+    cache_hit_tokens: int
+    cache_miss_tokens: int
 
 
 class AnalyzeRenderedMessagesResponse(BaseModel):
     prompt_id: int
     prompt_title: str
     analysis: str
+    run_id: str | None = None
+    usage: AnalysisUsage | None = None
 
 
 class RefreshUserStatsResponse(BaseModel):
@@ -145,3 +175,53 @@ class PromptOut(BaseModel):
     text: str
     created_at: datetime | None = None
     updated_at: datetime | None = None
+
+
+class PromptUsageResponse(AnalysisUsage):
+    prompt_id: int
+    runs: int
+
+
+class JobOut(BaseModel):
+    id: int
+    kind: str
+    status: str
+    params: dict[str, Any] = Field(default_factory=dict)
+    progress: dict[str, Any] = Field(default_factory=dict)
+    result: dict[str, Any] | None = None
+    error: str | None = None
+    created_at: datetime | None = None
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    updated_at: datetime | None = None
+
+
+class AnalysisRunOut(BaseModel):
+    id: UUID
+    prompt_id: int
+    kind: str
+    status: str
+    params: dict[str, Any] = Field(default_factory=dict)
+    result: dict[str, Any] | None = None
+    error: str | None = None
+    chunks: int = 0
+    completed_chunks: int = 0
+    created_at: datetime | None = None
+    finished_at: datetime | None = None
+    updated_at: datetime | None = None
+
+
+class AnalysisRunListResponse(BaseModel):
+    items: list[AnalysisRunOut]
+    next_offset: int | None
+
+
+class JobListResponse(BaseModel):
+    items: list[JobOut]
+    next_offset: int | None
+
+
+class LiveIngestStatus(BaseModel):
+    running: bool
+    channels: int
+    buffered: int
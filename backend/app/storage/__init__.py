@@ -1,13 +1,34 @@
+from .analysis_cache import AnalysisCacheRepository
+from .analysis_marks import AnalysisMarksRepository
+from .analysis_runs import AnalysisRunsRepository
+from .analysis_usage import AnalysisUsageRepository
 from .base import BaseStorage
 from .channels import ChannelsRepository
+from .entities import EntitiesRepository
+from .jobs import JobsRepository
+from .message_marks import MessageMarksRepository
 from .messages import MessagesRepository
 from .prompts import PromptsRepository
+from .table_versions import TableVersionsRepository
 from .users import UsersRepository
 
 
 class Storage(BaseStorage):
     def __init__(self) -> None:
+        self.analysis_cache: AnalysisCacheRepository = AnalysisCacheRepository()
+        self.analysis_marks: AnalysisMarksRepository = AnalysisMarksRepository()
+        self.analysis_runs: AnalysisRunsRepository = AnalysisRunsRepository()
+        self.analysis_usage: AnalysisUsageRepository = AnalysisUsageRepository()
         self.channels: ChannelsRepository = ChannelsRepository()
+        self.entities: EntitiesRepository = EntitiesRepository()
+        self.jobs: JobsRepository = JobsRepository()
         self.messages: MessagesRepository = MessagesRepository()
+        self.message_marks: MessageMarksRepository = MessageMarksRepository()
         self.prompts: PromptsRepository = PromptsRepository()
+        self.table_versions: TableVersionsRepository = TableVersionsRepository()
         self.users: UsersRepository = UsersRepository()
+
+    async def init(self) -> None:
+        await super().init()
+        await self.analysis_runs.interrupt_unfinished()
+        await self.users.load_usernames()
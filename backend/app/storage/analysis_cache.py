@@ -0,0 +1,58 @@
+from app.config import ANALYSIS_CACHE_MAX_ENTRIES
+from app.config import ANALYSIS_CACHE_TTL
+
+from .base import BaseRepository
+from .base import json_hash
+
+
+class AnalysisCacheRepository(BaseRepository):
+    @staticmethod
+    def make_key(model: str, prompt_text: str, messages: list[str]) -> bytes:
+        return json_hash([model, prompt_text, messages])
+
+    async def get(self, key: bytes) -> str | None:
+        return await self.pool.fetchval(
+            """
+            UPDATE analysis_cache
+            SET used_at = NOW()
+            WHERE key = $1
+              AND created_at > NOW() - $2::INTERVAL
+            RETURNING completion
+            """,
+            key,
+            ANALYSIS_CACHE_TTL,
+        )
+
+    async def put(self, key: bytes, model: str, completion: str) -> None:
+        await self.pool.execute(
+            """
+            INSERT INTO analysis_cache (key, model, completion, created_at, used_at)
+            VALUES ($1, $2, $3, NOW(), NOW())
+            ON CONFLICT (key)
+            DO UPDATE SET
+                model = EXCLUDED.model,
+                completion = EXCLUDED.completion,
+                created_at = NOW(),
+                used_at = NOW()
+            """,
+            key,
+            model,
+            completion,
+        )
+
+    async def prune(self) -> int:
+        result = await self.pool.execute(
+            """
+            DELETE FROM analysis_cache
+            WHERE created_at <= NOW() - $1::INTERVAL
+               OR key IN (
+                   SELECT key
+                   FROM analysis_cache
+                   ORDER BY used_at DESC
+                   OFFSET $2
+               )
+            """,
+            ANALYSIS_CACHE_TTL,
+            ANALYSIS_CACHE_MAX_ENTRIES,
+        )
+        return int(result.split()[-1])
@@ -0,0 +1,48 @@
+from datetime import datetime
+from typing import Any
+
+from .base import BaseRepository
+
+
+class AnalysisMarksRepository(BaseRepository):
+    async def list_by_channels(
+        self,
+        prompt_id: int,
+        channel_ids: list[int],
+    ) -> dict[int, dict[str, Any]]:
+        rows = await self.pool.fetch(
+            """
+            SELECT *
+            FROM analysis_marks
+            WHERE prompt_id = $1
+              AND channel_id = ANY($2::BIGINT[])
+            """,
+            prompt_id,
+            channel_ids,
+        )
+        return {row['channel_id']: dict(row) for row in rows}
+
+    async def upsert(
+        self,
+        prompt_id: int,
+        channel_id: int,
+        message_id: int,
+        message_date: datetime,
+    ) -> None:
+        # A watermark only moves forward, so an overlapping older run cannot rewind it.
+        await self.pool.execute(
+            """
+            INSERT INTO analysis_marks (prompt_id, channel_id, message_id, message_date, updated_at)
+            VALUES ($1, $2, $3, $4, NOW())
+            ON CONFLICT (prompt_id, channel_id)
+            DO UPDATE SET
+                message_id = EXCLUDED.message_id,
+                message_date = EXCLUDED.message_date,
+                updated_at = NOW()
+            WHERE analysis_marks.message_id < EXCLUDED.message_id
+            """,
+            prompt_id,
+            channel_id,
+            message_id,
+            message_date,
+        )
@@ -0,0 +1,178 @@
+from typing import Any
+from uuid import UUID
+
+from .base import BaseRepository
+
+
+class AnalysisRunsRepository(BaseRepository):
+    async def create(
+        self,
+        run_id: UUID,
+        prompt_id: int,
+        prompt_text: str,
+        kind: str,
+        params: dict[str, Any],
+    ) -> dict[str, Any] | None:
+        row = await self.pool.fetchrow(
+            """
+            INSERT INTO analysis_runs (id, prompt_id, prompt_text, kind, params, status, created_at, updated_at)
+            VALUES ($1, $2, $3, $4, $5, 'running', NOW(), NOW())
+            RETURNING *
+            """,
+            run_id,
+            prompt_id,
+            prompt_text,
+            kind,
+            params,
+        )
+        return dict(row) if row else None
+
+    async def get(self, run_id: UUID) -> dict[str, Any] | None:
+        row = await self.pool.fetchrow(
+            """
+            SELECT
+                runs.*,
+                COUNT(chunks.chunk) AS chunks,
+                COUNT(chunks.output) AS completed_chunks
+            FROM analysis_runs runs
+            LEFT JOIN analysis_run_chunks chunks ON chunks.run_id = runs.id
+            WHERE runs.id = $1
+            GROUP BY runs.id
+            """,
+            run_id,
+        )
+        return dict(row) if row else None
+
+    async def restart(self, run_id: UUID) -> None:
+        await self.pool.execute(
+            """
+            UPDATE analysis_runs
+            SET status = 'running', error = NULL, finished_at = NULL, updated_at = NOW()
+            WHERE id = $1
+            """,
+            run_id,
+        )
+
+    async def finish(
+        self,
+        run_id: UUID,
+        status: str,
+        result: dict[str, Any] | None = None,
+        error: str | None = None,
+    ) -> None:
+        await self.pool.execute(
+            """
+            UPDATE analysis_runs
+            SET status = $2,
+                result = $3,
+                error = $4,
+                finished_at = NOW(),
+                updated_at = NOW()
+            WHERE id = $1
+            """,
+            run_id,
+            status,
+            result,
+            error,
+        )
+
+    async def interrupt_unfinished(self) -> int:
+        result = await self.pool.execute(
+            """
+            UPDATE analysis_runs
+            SET status = 'interrupted', finished_at = NOW(), updated_at = NOW()
+            WHERE status = 'running'
+            """,
+        )
+        return int(result.split()[-1])
+
+    async def list_chunk_lines(self, run_id: UUID, scope: str, level: int) -> list[list[str]]:
+        rows = await self.pool.fetch(
+            """
+            SELECT lines
+            FROM analysis_run_chunks
+            WHERE run_id = $1 AND scope = $2 AND level = $3
+            ORDER BY chunk
+            """,
+            run_id,
+            scope,
+            level,
+        )
+        return [row['lines'] for row in rows]
+
+    async def save_chunks(
+        self,
+        run_id: UUID,
+        scope: str,
+        level: int,
+        chunks: list[list[str]],
+    ) -> dict[int, str]:
+        # A chunk whose lines changed since the last attempt loses its output and is analyzed again.
+        await self.pool.executemany(
+            """
+            INSERT INTO analysis_run_chunks (run_id, scope, level, chunk, lines, updated_at)
+            VALUES ($1, $2, $3, $4, $5, NOW())
+            ON CONFLICT (run_id, scope, level, chunk)
+            DO UPDATE SET
+                lines = EXCLUDED.lines,
+                output = NULL,
+                updated_at = NOW()
+            WHERE analysis_run_chunks.lines IS DISTINCT FROM EXCLUDED.lines
+            """,
+            [(run_id, scope, level, index, lines) for index, lines in enumerate(chunks, start=1)],
+        )
+        rows = await self.pool.fetch(
+            """
+            SELECT chunk, output
+            FROM analysis_run_chunks
+            WHERE run_id = $1 AND scope = $2 AND level = $3
+              AND chunk <= $4
+              AND output IS NOT NULL
+            """,
+            run_id,
+            scope,
+            level,
+            len(chunks),
+        )
+        return {row['chunk']: row['output'] for row in rows}
+
+    async def complete_chunk(
+        self,
+        run_id: UUID,
+        scope: str,
+        level: int,
+        chunk: int,
+        output: str,
+    ) -> None:
+        await self.pool.execute(
+            """
+            UPDATE analysis_run_chunks
+            SET output = $5, updated_at = NOW()
+            WHERE run_id = $1 AND scope = $2 AND level = $3 AND chunk = $4
+            """,
+            run_id,
+            scope,
+            level,
+            chunk,
+            output,
+        )
+
+    async def list(self, offset, limit, status: str | None = None):
+        rows = await self.pool.fetch(
+            """
+            SELECT
+                runs.*,
+                COUNT(chunks.chunk) AS chunks,
+                COUNT(chunks.output) AS completed_chunks
+            FROM analysis_runs runs
+            LEFT JOIN analysis_run_chunks chunks ON chunks.run_id = runs.id
+            WHERE $1::TEXT IS NULL OR runs.status = $1
+            GROUP BY runs.id
+            ORDER BY runs.created_at DESC
+            OFFSET $2 LIMIT $3
+            """,
+            status,
+            offset,
+            limit,
+        )
+        return [dict(row) for row in rows]
@@ -0,0 +1,63 @@
+from typing import Any
+
+from .base import BaseRepository
+
+
+_TOTALS_SQL = """
+    SELECT
+        COUNT(*) AS calls,
+        COUNT(DISTINCT run_id) AS runs,
+        COALESCE(SUM(prompt_tokens), 0) AS prompt_tokens,
+        COALESCE(SUM(completion_tokens), 0) AS completion_tokens,
+        COALESCE(SUM(cache_hit_tokens), 0) AS cache_hit_tokens,
+        COALESCE(SUM(cache_miss_tokens), 0) AS cache_miss_tokens
+    FROM analysis_usage
+"""
+
+
+class AnalysisUsageRepository(BaseRepository):
+    async def add(
+        self,
+        run_id: str,
+        prompt_id: int,
+        model: str,
+        scope: str,
+        level: int,
+        chunk: int,
+        usage: dict[str, int],
+    ) -> None:
+        await self.pool.execute(
+            """
+            INSERT INTO analysis_usage (
+                run_id,
+                prompt_id,
+                model,
+                scope,
+                level,
+                chunk,
+                prompt_tokens,
+                completion_tokens,
+                cache_hit_tokens,
+                cache_miss_tokens
+            )
+            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
+            """,
+            run_id,
+            prompt_id,
+            model,
+            scope,
+            level,
+            chunk,
+            usage['prompt_tokens'],
+            usage['completion_tokens'],
+            usage['cache_hit_tokens'],
+            usage['cache_miss_tokens'],
+        )
+
+    async def totals_by_run(self, run_id: str) -> dict[str, Any]:
+        row = await self.pool.fetchrow(_TOTALS_SQL + 'WHERE run_id = $1', run_id)
+        return dict(row)
+
+    async def totals_by_prompt(self, prompt_id: int) -> dict[str, Any]:
+        row = await self.pool.fetchrow(_TOTALS_SQL + 'WHERE prompt_id = $1', prompt_id)
+        return {'prompt_id': prompt_id, **dict(row)}
@@ -1,3 +1,4 @@
+import hashlib
 import json
 from datetime import date
 from datetime import datetime
@@ -22,7 +23,7 @@ def _json_default(value: object) -> str:
     return str(value)
 
 
-def _json_encode(value: object) -> str:
+def json_encode(value: object) -> str:
     return json.dumps(
         value,
         ensure_ascii=False,
@@ -31,6 +32,17 @@ def _json_encode(value: object) -> str:
     )
 
 
+def json_hash(value: object) -> bytes:
+    encoded = json.dumps(
+        value,
+        ensure_ascii=False,
+        separators=(',', ':'),
+        sort_keys=True,
+        default=_json_default,
+    )
+    return hashlib.blake2b(encoded.encode('utf-8'), digest_size=16).digest()
+
+
 def _encode_date(value: date | datetime) -> str:
     if isinstance(value, datetime):
         return value.date().isoformat()
@@ -39,7 +51,7 @@ def _encode_date(value: date | datetime) -> str:
     raise TypeError(f'Unsupported date value type: {type(value).__name__}')
 
 
-def _encode_timestamptz(value: datetime | date) -> str:
+def encode_timestamptz(value: datetime | date) -> str:
     if isinstance(value, datetime):
         if value.tzinfo is None:
             value = value.replace(tzinfo=timezone.utc)
@@ -61,14 +73,14 @@ async def _init_connection_codecs(connection: asyncpg.Connection) -> None:
     await connection.set_type_codec(
         'json',
         schema='pg_catalog',
-        encoder=_json_encode,
+        encoder=json_encode,
         decoder=json.loads,
         format='text',
     )
     await connection.set_type_codec(
         'jsonb',
         schema='pg_catalog',
-        encoder=_json_encode,
+        encoder=json_encode,
         decoder=json.loads,
         format='text',
     )
@@ -82,7 +94,7 @@ async def _init_connection_codecs(connection: asyncpg.Connection) -> None:
     await connection.set_type_codec(
         'timestamptz',
         schema='pg_catalog',
-        encoder=_encode_timestamptz,
+        encoder=encode_timestamptz,
         decoder=_decode_timestamptz,
         format='text',
     )
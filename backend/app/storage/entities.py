@@ -0,0 +1,45 @@
+from typing import Any
+
+from .base import BaseRepository
+
+
+class EntitiesRepository(BaseRepository):
+    async def get(self, entity_id: int, peer_types: list[str]) -> dict[str, Any] | None:
+        row = await self.pool.fetchrow(
+            """
+            SELECT *
+            FROM entities
+            WHERE id = $1
+              AND peer_type = ANY($2::TEXT[])
+            ORDER BY updated_at DESC
+            LIMIT 1
+            """,
+            entity_id,
+            peer_types,
+        )
+        return dict(row) if row else None
+
+    async def upsert_many(self, entities: list[dict[str, Any]]) -> None:
+        if not entities:
+            return
+        await self.pool.execute(
+            """
+            INSERT INTO entities (peer_type, id, access_hash, username, updated_at)
+            SELECT peer_type, id, access_hash, username, NOW()
+            FROM unnest(
+                $1::TEXT[],
+                $2::BIGINT[],
+                $3::BIGINT[],
+                $4::TEXT[]
+            ) AS value(peer_type, id, access_hash, username)
+            ON CONFLICT (peer_type, id)
+            DO UPDATE SET
+                access_hash = EXCLUDED.access_hash,
+                username = EXCLUDED.username,
+                updated_at = NOW()
+            """,
+            [entity['peer_type'] for entity in entities],
+            [entity['id'] for entity in entities],
+            [entity.get('access_hash') for entity in entities],
+            [entity.get('username') for entity in entities],
+        )
@@ -0,0 +1,91 @@
+from typing import Any
+
+from .base import BaseRepository
+
+
+class JobsRepository(BaseRepository):
+    async def create(self, kind: str, params: dict[str, Any]) -> dict[str, Any] | None:
+        row = await self.pool.fetchrow(
+            """
+            INSERT INTO jobs (kind, status, params, created_at, updated_at)
+            VALUES ($1, 'queued', $2, NOW(), NOW())
+            RETURNING *
+            """,
+            kind,
+            params,
+        )
+        return dict(row) if row else None
+
+    async def get(self, job_id: int) -> dict[str, Any] | None:
+        row = await self.pool.fetchrow(
+            'SELECT * FROM jobs WHERE id = $1',
+            job_id,
+        )
+        return dict(row) if row else None
+
+    async def list(self, offset, limit, kind: str | None = None):
+        rows = await self.pool.fetch(
+            """
+            SELECT *
+            FROM jobs
+            WHERE $1::TEXT IS NULL OR kind = $1
+            ORDER BY id DESC
+            OFFSET $2 LIMIT $3
+            """,
+            kind,
+            offset,
+            limit,
+        )
+        return [dict(row) for row in rows]
+
+    async def start(self, job_id: int) -> None:
+        await self.pool.execute(
+            """
+            UPDATE jobs
+            SET status = 'running', started_at = NOW(), updated_at = NOW()
+            WHERE id = $1
+            """,
+            job_id,
+        )
+
+    async def update_progress(self, job_id: int, progress: dict[str, Any]) -> None:
+        await self.pool.execute(
+            'UPDATE jobs SET progress = $2, updated_at = NOW() WHERE id = $1',
+            job_id,
+            progress,
+        )
+
+    async def finish(
+        self,
+        job_id: int,
+        status: str,
+        result: dict[str, Any] | None = None,
+        error: str | None = None,
+    ) -> dict[str, Any] | None:
+        row = await self.pool.fetchrow(
+            """
+            UPDATE jobs
+            SET status = $2,
+                result = $3,
+                error = $4,
+                finished_at = NOW(),
+                updated_at = NOW()
+            WHERE id = $1
+            RETURNING *
+            """,
+            job_id,
+            status,
+            result,
+            error,
+        )
+        return dict(row) if row else None
+
+    async def interrupt_unfinished(self) -> int:
+        result = await self.pool.execute(
+            """
+            UPDATE jobs
+            SET status = 'interrupted', finished_at = NOW(), updated_at = NOW()
+            WHERE status IN ('queued', 'running')
+            """,
+        )
+        return int(result.split()[-1])
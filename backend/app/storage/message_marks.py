@@ -0,0 +1,41 @@
+from typing import Any
+
+from .base import BaseRepository
+
+
+class MessageMarksRepository(BaseRepository):
+    async def get(self, channel_id: int) -> dict[str, Any] | None:
+        row = await self.pool.fetchrow(
+            'SELECT * FROM message_marks WHERE channel_id = $1',
+            channel_id,
+        )
+        return dict(row) if row else None
+
+    async def upsert(self, mark: dict[str, Any]) -> dict[str, Any] | None:
+        row = await self.pool.fetchrow(
+            """
+            INSERT INTO message_marks (
+                channel_id,
+                synced_from,
+                synced_to,
+                message_id,
+                message_date,
+                updated_at
+            )
+            VALUES ($1, $2, $3, $4, $5, NOW())
+            ON CONFLICT (channel_id)
+            DO UPDATE SET
+                synced_from = EXCLUDED.synced_from,
+                synced_to = EXCLUDED.synced_to,
+                message_id = EXCLUDED.message_id,
+                message_date = EXCLUDED.message_date,
+                updated_at = NOW()
+            RETURNING *
+            """,
+            mark['channel_id'],
+            mark['synced_from'],
+            mark['synced_to'],
+            mark.get('message_id'),
+            mark.get('message_date'),
+        )
+        return dict(row) if row else None
@@ -3,57 +3,127 @@ from typing import Any
 
 from app.common import normalize_int_list
 from app.common import safe_int
+from app.config import MESSAGES_BULK_UPSERT_MIN_ROWS
 
 from .base import BaseRepository
+from .base import encode_timestamptz
+from .base import json_encode
+from .base import json_hash
 
 
 class MessagesRepository(BaseRepository):
-    async def list_by_channel_and_date(
+    _UPSERT_CONFLICT_SQL = """
+        ON CONFLICT (channel_id, message_id)
+        DO UPDATE SET
+            detail = EXCLUDED.detail,
+            date = EXCLUDED.date,
+            content_hash = EXCLUDED.content_hash,
+            rendered_line = NULL
+        WHERE messages.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+        RETURNING (xmax = 0) AS inserted
+    """
+
+    async def list_by_channel_and_ids(
         self,
         channel_id: int,
-        date_from: datetime,
-        date_to: datetime,
+        message_ids: list[int],
     ) -> list[dict[str, Any]]:
         normalized_channel_id = safe_int(channel_id)
         if normalized_channel_id is None:
             return []
+        normalized = normalize_int_list(message_ids)
+        if not normalized:
+            return []
         rows = await self.pool.fetch(
             """
             SELECT channel_id, message_id, detail, date
             FROM messages
+            WHERE channel_id = $1
+              AND message_id = ANY($2::BIGINT[])
+            ORDER BY date ASC NULLS FIRST, message_id ASC
+            """,
+            normalized_channel_id,
+            normalized,
+        )
+        return self._rows_to_details(rows)
+
+    async def list_rendered_by_channel_and_date(
+        self,
+        channel_id: int,
+        date_from: datetime,
+        date_to: datetime,
+        after_message_id: int | None = None,
+    ) -> list[dict[str, Any]]:
+        rows = await self.pool.fetch(
+            """
+            SELECT message_id AS id, date, reply_to_id, content_hash, rendered_line
+            FROM messages
             WHERE channel_id = $1
               AND date BETWEEN $2 AND $3
+              AND ($4::BIGINT IS NULL OR message_id > $4)
             ORDER BY date ASC, message_id ASC
             """,
-            normalized_channel_id,
+            channel_id,
             date_from,
             date_to,
+            after_message_id,
         )
-        return self._rows_to_details(rows)
+        return [dict(row) for row in rows]
 
-    async def list_by_channel_and_ids(
+    async def list_rendered_by_channel_and_ids(
         self,
         channel_id: int,
         message_ids: list[int],
     ) -> list[dict[str, Any]]:
-        normalized_channel_id = safe_int(channel_id)
-        if normalized_channel_id is None:
-            return []
         normalized = normalize_int_list(message_ids)
         if not normalized:
             return []
         rows = await self.pool.fetch(
             """
-            SELECT channel_id, message_id, detail, date
+            SELECT message_id AS id, date, reply_to_id, content_hash, rendered_line
             FROM messages
             WHERE channel_id = $1
               AND message_id = ANY($2::BIGINT[])
-            ORDER BY date ASC NULLS FIRST, message_id ASC
+            ORDER BY date ASC, message_id ASC
             """,
-            normalized_channel_id,
+            channel_id,
             normalized,
         )
-        return self._rows_to_details(rows)
+        return [dict(row) for row in rows]
+
+    async def save_rendered_lines(
+        self,
+        channel_id: int,
+        messages: list[dict[str, Any]],
+    ) -> None:
+        if not messages:
+            return
+        # Lines rendered from a detail or an author username that has changed since it was read are not saved.
+        await self.pool.execute(
+            """
+            UPDATE messages
+            SET rendered_line = value.rendered_line
+            FROM unnest(
+                $2::BIGINT[],
+                $3::BYTEA[],
+                $4::TEXT[],
+                $5::TEXT[]
+            ) AS value(message_id, content_hash, rendered_line, username)
+            WHERE messages.channel_id = $1
+              AND messages.message_id = value.message_id
+              AND messages.content_hash IS NOT DISTINCT FROM value.content_hash
+              AND (
+                  SELECT NULLIF(users.username, '')
+                  FROM users
+                  WHERE users.id = messages.user_id
+              ) IS NOT DISTINCT FROM value.username
+            """,
+            channel_id,
+            [message['id'] for message in messages],
+            [message['content_hash'] for message in messages],
+            [message['rendered_line'] for message in messages],
+            [message['username'] for message in messages],
+        )
 
     def _rows_to_details(self, rows: list[Any]) -> list[dict[str, Any]]:
         items: list[dict[str, Any]] = []
@@ -70,6 +140,7 @@ class MessagesRepository(BaseRepository):
         self,
         channel_id: int,
         messages: list[dict[str, Any]],
+        bulk: bool | None = None,
     ) -> dict[str, int]:
         if not messages:
             return {'processed': 0, 'upserted': 0, 'modified': 0, 'skipped': 0}
@@ -103,45 +174,135 @@ class MessagesRepository(BaseRepository):
 
         processed = len(normalized_by_id)
         skipped += max(len(messages) - skipped - processed, 0)
-        message_ids = list(normalized_by_id.keys())
-        channel_ids = [normalized_channel_id] * processed
-        details = [normalized_by_id[message_id] for message_id in message_ids]
-        dates = [normalized_by_id[message_id]['date'] for message_id in message_ids]
+        stored_hashes = await self._get_content_hashes(
+            normalized_channel_id,
+            list(normalized_by_id.keys()),
+        )
+        message_ids: list[int] = []
+        details: list[dict[str, Any]] = []
+        content_hashes: list[bytes] = []
+        for message_id, payload in normalized_by_id.items():
+            content_hash = json_hash(payload)
+            if stored_hashes.get(message_id) == content_hash:
+                continue
+            message_ids.append(message_id)
+            details.append(payload)
+            content_hashes.append(content_hash)
+        rows = []
+        if message_ids:
+            if bulk is None:
+                bulk = len(message_ids) >= MESSAGES_BULK_UPSERT_MIN_ROWS
+            upsert = self._copy_upsert if bulk else self._unnest_upsert
+            rows = await upsert(normalized_channel_id, message_ids, details, content_hashes)
+        upserted = sum(1 for row in rows if row['inserted'])
+        modified = len(rows) - upserted
+        return {
+            'processed': processed,
+            'upserted': upserted,
+            'modified': modified,
+            'skipped': skipped,
+        }
 
+    async def _get_content_hashes(
+        self,
+        channel_id: int,
+        message_ids: list[int],
+    ) -> dict[int, bytes]:
         rows = await self.pool.fetch(
             """
+            SELECT message_id, content_hash
+            FROM messages
+            WHERE channel_id = $1
+              AND message_id = ANY($2::BIGINT[])
+            """,
+            channel_id,
+            message_ids,
+        )
+        return {row['message_id']: row['content_hash'] for row in rows}
+
+    async def _unnest_upsert(
+        self,
+        channel_id: int,
+        message_ids: list[int],
+        details: list[dict[str, Any]],
+        content_hashes: list[bytes],
+    ) -> list[Any]:
+        return await self.pool.fetch(
+            f"""
             WITH payload AS (
                 SELECT *
                 FROM unnest(
-                    $1::BIGINT[],
                     $2::BIGINT[],
                     $3::JSONB[],
-                    $4::TIMESTAMPTZ[]
-                ) AS value(channel_id, message_id, detail, date)
+                    $4::TIMESTAMPTZ[],
+                    $5::BYTEA[]
+                ) AS value(message_id, detail, date, content_hash)
             )
-            INSERT INTO messages (channel_id, message_id, detail, date)
-            SELECT channel_id, message_id, detail, date
+            INSERT INTO messages (channel_id, message_id, detail, date, content_hash)
+            SELECT $1, message_id, detail, date, content_hash
             FROM payload
-            ON CONFLICT (channel_id, message_id)
-            DO UPDATE SET
-                detail = EXCLUDED.detail,
-                date = EXCLUDED.date
-            WHERE messages.detail IS DISTINCT FROM EXCLUDED.detail
-            RETURNING (xmax = 0) AS inserted
+            {self._UPSERT_CONFLICT_SQL}
             """,
-            channel_ids,
+            channel_id,
             message_ids,
             details,
-            dates,
+            [detail['date'] for detail in details],
+            content_hashes,
         )
-        upserted = sum(1 for row in rows if row['inserted'])
-        modified = len(rows) - upserted
-        return {
-            'processed': processed,
-            'upserted': upserted,
-            'modified': modified,
-            'skipped': skipped,
-        }
+
+    async def _copy_upsert(
+        self,
+        channel_id: int,
+        message_ids: list[int],
+        details: list[dict[str, Any]],
+        content_hashes: list[bytes],
+    ) -> list[Any]:
+        # Binary COPY can't use the text jsonb/timestamptz codecs, so values are staged as text and cast on merge.
+        records = [
+            (message_id, json_encode(detail), encode_timestamptz(detail['date']), content_hash)
+            for message_id, detail, content_hash in zip(message_ids, details, content_hashes)
+        ]
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    """
+                    CREATE TEMP TABLE IF NOT EXISTS messages_staging (
+                        message_id BIGINT NOT NULL,
+                        detail TEXT NOT NULL,
+                        date TEXT NOT NULL,
+                        content_hash BYTEA NOT NULL
+                    ) ON COMMIT DELETE ROWS
+                    """
+                )
+                await conn.copy_records_to_table(
+                    'messages_staging',
+                    records=records,
+                    columns=['message_id', 'detail', 'date', 'content_hash'],
+                )
+                return await conn.fetch(
+                    f"""
+                    INSERT INTO messages (channel_id, message_id, detail, date, content_hash)
+                    SELECT $1, message_id, detail::JSONB, date::TIMESTAMPTZ, content_hash
+                    FROM messages_staging
+                    {self._UPSERT_CONFLICT_SQL}
+                    """,
+                    channel_id,
+                )
+
+    async def delete_many(self, channel_id: int, message_ids: list[int]) -> int:
+        normalized = normalize_int_list(message_ids)
+        if not normalized:
+            return 0
+        result = await self.pool.execute(
+            """
+            DELETE FROM messages
+            WHERE channel_id = $1
+              AND message_id = ANY($2::BIGINT[])
+            """,
+            channel_id,
+            normalized,
+        )
+        return int(result.split()[-1])
 
     async def _aggregate_user_message_stats(
         self,
@@ -149,24 +310,12 @@ class MessagesRepository(BaseRepository):
     ) -> list[dict[str, Any]]:
         rows = await self.pool.fetch(
             """
-            WITH extracted AS (
-                SELECT
-                    channel_id,
-                    CASE
-                        WHEN COALESCE(detail->'from_id'->>'user_id', '') ~ '^-?\\d+$' THEN
-                            (detail->'from_id'->>'user_id')::BIGINT
-                        WHEN COALESCE(detail->>'sender_id', '') ~ '^-?\\d+$' THEN
-                            (detail->>'sender_id')::BIGINT
-                        ELSE NULL
-                    END AS sender_id
+            WITH filtered AS (
+                SELECT channel_id, user_id AS sender_id
                 FROM messages
-            ),
-            filtered AS (
-                SELECT channel_id, sender_id
-                FROM extracted
-                WHERE sender_id IS NOT NULL
-                  AND sender_id <> channel_id
-                  AND ($1::BIGINT[] IS NULL OR sender_id = ANY($1::BIGINT[]))
+                WHERE user_id IS NOT NULL
+                  AND user_id <> channel_id
+                  AND ($1::BIGINT[] IS NULL OR user_id = ANY($1::BIGINT[]))
             ),
             by_channel AS (
                 SELECT
@@ -32,6 +32,7 @@ CREATE TABLE IF NOT EXISTS messages (
     message_id BIGINT NOT NULL,
     detail JSONB NOT NULL,
     date TIMESTAMPTZ NOT NULL,
+    content_hash BYTEA,
     created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
     updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
     PRIMARY KEY (channel_id, message_id)
@@ -41,11 +42,31 @@ ALTER TABLE messages ADD COLUMN IF NOT EXISTS date TIMESTAMPTZ;
 UPDATE messages
 SET date = (detail->>'date')::TIMESTAMPTZ
 WHERE date IS NULL;
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS content_hash BYTEA;
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS user_id BIGINT GENERATED ALWAYS AS (
+    CASE
+        WHEN COALESCE(detail->'from_id'->>'user_id', '') ~ '^-?\d+$' THEN
+            (detail->'from_id'->>'user_id')::BIGINT
+        WHEN COALESCE(detail->>'sender_id', '') ~ '^-?\d+$' THEN
+            (detail->>'sender_id')::BIGINT
+    END
+) STORED;
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS reply_to_id BIGINT GENERATED ALWAYS AS (
+    CASE
+        WHEN COALESCE(detail->'reply_to'->>'reply_to_msg_id', '') ~ '^-?\d+$' THEN
+            (detail->'reply_to'->>'reply_to_msg_id')::BIGINT
+        WHEN COALESCE(detail->'reply_to'->>'reply_to_message_id', '') ~ '^-?\d+$' THEN
+            (detail->'reply_to'->>'reply_to_message_id')::BIGINT
+        WHEN COALESCE(detail->'reply_to'->>'reply_to_top_id', '') ~ '^-?\d+$' THEN
+            (detail->'reply_to'->>'reply_to_top_id')::BIGINT
+    END
+) STORED;
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS rendered_line TEXT;
 
 CREATE OR REPLACE FUNCTION messages_set_updated_at()
 RETURNS TRIGGER AS $$
 BEGIN
-    IF NEW.detail IS DISTINCT FROM OLD.detail THEN
+    IF NEW.content_hash IS DISTINCT FROM OLD.content_hash THEN
         NEW.updated_at = NOW();
     ELSE
         NEW.updated_at = OLD.updated_at;
@@ -60,11 +81,260 @@ BEFORE UPDATE ON messages
 FOR EACH ROW
 EXECUTE FUNCTION messages_set_updated_at();
 
+-- Rendered lines carry the author's username, so they are rebuilt once it changes.
+CREATE OR REPLACE FUNCTION users_reset_rendered_lines()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' OR NEW.username IS DISTINCT FROM OLD.username THEN
+        UPDATE messages
+        SET rendered_line = NULL
+        WHERE user_id = NEW.id
+          AND rendered_line IS NOT NULL;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_users_reset_rendered_lines ON users;
+CREATE TRIGGER trg_users_reset_rendered_lines
+AFTER INSERT OR UPDATE OF username ON users
+FOR EACH ROW
+EXECUTE FUNCTION users_reset_rendered_lines();
+
+-- Lists keep the first occurrence of every element; duplicates are found by hashing the jsonb values.
+CREATE OR REPLACE FUNCTION conclusion_merge_lists(existing JSONB, incoming JSONB)
+RETURNS JSONB AS $$
+    SELECT COALESCE(jsonb_agg(value ORDER BY position), '[]'::JSONB)
+    FROM (
+        SELECT value, MIN(position) AS position
+        FROM jsonb_array_elements(existing || incoming) WITH ORDINALITY AS element (value, position)
+        GROUP BY value
+    ) deduplicated
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Objects merge key by key, lists are concatenated without duplicates and differing scalars become a list.
+CREATE OR REPLACE FUNCTION conclusion_merge(existing JSONB, incoming JSONB)
+RETURNS JSONB AS $$
+BEGIN
+    IF existing IS NULL OR jsonb_typeof(existing) = 'null' THEN
+        RETURN incoming;
+    END IF;
+    IF incoming IS NULL OR jsonb_typeof(incoming) = 'null' THEN
+        RETURN existing;
+    END IF;
+    IF jsonb_typeof(existing) = 'object' AND jsonb_typeof(incoming) = 'object' THEN
+        RETURN existing || COALESCE(
+            (
+                SELECT jsonb_object_agg(key, conclusion_merge(existing -> key, value))
+                FROM jsonb_each(incoming)
+            ),
+            '{}'::JSONB
+        );
+    END IF;
+    IF jsonb_typeof(existing) = 'array' AND jsonb_typeof(incoming) = 'array' THEN
+        RETURN conclusion_merge_lists(existing, incoming);
+    END IF;
+    IF jsonb_typeof(existing) = 'array' THEN
+        RETURN conclusion_merge_lists(existing, jsonb_build_array(incoming));
+    END IF;
+    IF jsonb_typeof(incoming) = 'array' THEN
+        RETURN conclusion_merge_lists(jsonb_build_array(existing), incoming);
+    END IF;
+    IF existing = incoming THEN
+        RETURN existing;
+    END IF;
+    RETURN jsonb_build_array(existing, incoming);
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+CREATE OR REPLACE AGGREGATE conclusion_merge_agg(JSONB) (
+    SFUNC = conclusion_merge,
+    STYPE = JSONB
+);
+
+CREATE TABLE IF NOT EXISTS message_marks (
+    channel_id BIGINT PRIMARY KEY,
+    synced_from TIMESTAMPTZ NOT NULL,
+    synced_to TIMESTAMPTZ NOT NULL,
+    message_id BIGINT,
+    message_date TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS entities (
+    peer_type TEXT NOT NULL,
+    id BIGINT NOT NULL,
+    access_hash BIGINT,
+    username TEXT,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (peer_type, id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_entities_id ON entities (id);
+
+CREATE TABLE IF NOT EXISTS analysis_cache (
+    key BYTEA PRIMARY KEY,
+    model TEXT NOT NULL,
+    completion TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    used_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_analysis_cache_used_at ON analysis_cache (used_at);
+
+CREATE TABLE IF NOT EXISTS analysis_marks (
+    prompt_id BIGINT NOT NULL REFERENCES prompts (id) ON DELETE CASCADE,
+    channel_id BIGINT NOT NULL,
+    message_id BIGINT NOT NULL,
+    message_date TIMESTAMPTZ NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (prompt_id, channel_id)
+);
+
+-- Watermarks only hold for the prompt text they were produced with.
+CREATE OR REPLACE FUNCTION prompts_reset_analysis_marks()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.text IS DISTINCT FROM OLD.text THEN
+        DELETE FROM analysis_marks WHERE prompt_id = NEW.id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_prompts_reset_analysis_marks ON prompts;
+CREATE TRIGGER trg_prompts_reset_analysis_marks
+AFTER UPDATE OF text ON prompts
+FOR EACH ROW
+EXECUTE FUNCTION prompts_reset_analysis_marks();
+
+CREATE TABLE IF NOT EXISTS analysis_usage (
+    id BIGSERIAL PRIMARY KEY,
+    run_id UUID NOT NULL,
+    prompt_id BIGINT NOT NULL,
+    model TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    level INTEGER NOT NULL,
+    chunk INTEGER NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    cache_hit_tokens INTEGER NOT NULL,
+    cache_miss_tokens INTEGER NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_analysis_usage_run_id ON analysis_usage (run_id);
+CREATE INDEX IF NOT EXISTS idx_analysis_usage_prompt_id ON analysis_usage (prompt_id);
+
+CREATE TABLE IF NOT EXISTS analysis_runs (
+    id UUID PRIMARY KEY,
+    prompt_id BIGINT NOT NULL REFERENCES prompts (id) ON DELETE CASCADE,
+    prompt_text TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    params JSONB NOT NULL DEFAULT '{}'::JSONB,
+    status TEXT NOT NULL,
+    result JSONB,
+    error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    finished_at TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- The chunk plan of a run; a chunk with an output is complete and is not sent again on resume.
+CREATE TABLE IF NOT EXISTS analysis_run_chunks (
+    run_id UUID NOT NULL REFERENCES analysis_runs (id) ON DELETE CASCADE,
+    scope TEXT NOT NULL,
+    level INTEGER NOT NULL,
+    chunk INTEGER NOT NULL,
+    lines JSONB NOT NULL,
+    output TEXT,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (run_id, scope, level, chunk)
+);
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id BIGSERIAL PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    params JSONB NOT NULL DEFAULT '{}'::JSONB,
+    progress JSONB NOT NULL DEFAULT '{}'::JSONB,
+    result JSONB,
+    error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    started_at TIMESTAMPTZ,
+    finished_at TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE SEQUENCE IF NOT EXISTS table_version_seq;
+
+-- One row per table and backend, so concurrent writers never wait on a shared counter.
+CREATE TABLE IF NOT EXISTS table_version_slots (
+    name TEXT NOT NULL,
+    backend_pid INTEGER NOT NULL,
+    version BIGINT NOT NULL,
+    PRIMARY KEY (name, backend_pid)
+);
+
+-- Rows of finished backends are folded into slot 0, which keeps every table's sum unchanged.
+WITH folded AS (
+    DELETE FROM table_version_slots
+    WHERE backend_pid <> 0
+      AND backend_pid NOT IN (SELECT pid FROM pg_stat_activity)
+    RETURNING name, version
+)
+INSERT INTO table_version_slots (name, backend_pid, version)
+SELECT name, 0, SUM(version)
+FROM folded
+GROUP BY name
+ON CONFLICT (name, backend_pid)
+DO UPDATE SET version = table_version_slots.version + EXCLUDED.version;
+
+-- List ETags use the sum of a table's slots: every committed write raises its slot to a fresh sequence value,
+-- and the slot is written in the writing transaction so a version never precedes its data.
+CREATE OR REPLACE FUNCTION bump_table_version()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO table_version_slots (name, backend_pid, version)
+    VALUES (TG_TABLE_NAME, pg_backend_pid(), nextval('table_version_seq'))
+    ON CONFLICT (name, backend_pid)
+    DO UPDATE SET version = EXCLUDED.version;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_channels_bump_version ON channels;
+CREATE TRIGGER trg_channels_bump_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON channels
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_table_version();
+
+DROP TRIGGER IF EXISTS trg_users_bump_version ON users;
+CREATE TRIGGER trg_users_bump_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON users
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_table_version();
+
+DROP TRIGGER IF EXISTS trg_prompts_bump_version ON prompts;
+CREATE TRIGGER trg_prompts_bump_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON prompts
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_table_version();
+
+-- Rendered-line writes do not touch detail, so they leave the messages version alone.
+DROP TRIGGER IF EXISTS trg_messages_bump_version ON messages;
+CREATE TRIGGER trg_messages_bump_version
+AFTER INSERT OR UPDATE OF detail OR DELETE OR TRUNCATE ON messages
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_table_version();
+
 CREATE INDEX IF NOT EXISTS idx_messages_channel_id ON messages (channel_id);
 CREATE INDEX IF NOT EXISTS idx_messages_channel_date ON messages (channel_id, date);
+CREATE INDEX IF NOT EXISTS idx_messages_user_id ON messages (user_id);
 
 ALTER TABLE users DROP COLUMN IF EXISTS messages_count;
 ALTER TABLE users ADD COLUMN IF NOT EXISTS conclusion JSONB;
 DROP INDEX IF EXISTS idx_users_activity;
 DROP TABLE IF EXISTS channel_users;
 DROP TABLE IF EXISTS migrations;
+DROP TABLE IF EXISTS table_versions;
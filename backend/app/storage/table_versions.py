@@ -0,0 +1,16 @@
+from .base import BaseRepository
+
+
+class TableVersionsRepository(BaseRepository):
+    async def get(self, names: list[str]) -> list[int]:
+        rows = await self.pool.fetch(
+            """
+            SELECT name, SUM(version)::BIGINT AS version
+            FROM table_version_slots
+            WHERE name = ANY($1::TEXT[])
+            GROUP BY name
+            """,
+            names,
+        )
+        versions = {row['name']: row['version'] for row in rows}
+        return [versions.get(name, 0) for name in names]
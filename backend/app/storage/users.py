@@ -6,6 +6,32 @@ from .base import BaseRepository
 
 
 class UsersRepository(BaseRepository):
+    def __init__(self) -> None:
+        # id -> username for every known user; None marks users without a username or not stored yet.
+        self.usernames: dict[int, str | None] = {}
+
+    async def load_usernames(self) -> None:
+        rows = await self.pool.fetch('SELECT id, username FROM users')
+        self.usernames = {row['id']: row['username'] for row in rows}
+
+    async def get_usernames(self, user_ids: list[int]) -> dict[int, str]:
+        normalized = normalize_int_list(user_ids)
+        missing = [user_id for user_id in normalized if user_id not in self.usernames]
+        if missing:
+            rows = await self.pool.fetch(
+                'SELECT id, username FROM users WHERE id = ANY($1)',
+                missing,
+            )
+            fetched = {row['id']: row['username'] for row in rows}
+            # A write-through that landed while the query was running is newer than the fetched row.
+            for user_id in missing:
+                self.usernames.setdefault(user_id, fetched.get(user_id))
+        return {
+            user_id: self.usernames[user_id]
+            for user_id in normalized
+            if self.usernames[user_id]
+        }
+
     async def upsert(self, user):
         row = await self.pool.fetchrow(
             """
@@ -36,6 +62,8 @@ class UsersRepository(BaseRepository):
             user.get('bio'),
             user.get('photo'),
         )
+        if row:
+            self.usernames[row['id']] = row['username']
         return dict(row) if row else None
 
     async def upsert_profile(self, user):
@@ -68,16 +96,17 @@ class UsersRepository(BaseRepository):
             user.get('bio'),
             user.get('photo'),
         )
+        if row:
+            self.usernames[row['id']] = row['username']
         return dict(row) if row else None
 
     async def upsert_conclusions(
         self,
         conclusions: list[dict[str, Any]],
     ) -> int:
-        if not conclusions:
-            return 0
-        incoming_by_id: dict[int, dict[str, Any]] = {}
-        for item in conclusions:
+        user_ids: list[int] = []
+        incoming: list[dict[str, Any]] = []
+        for item in conclusions or []:
             if not isinstance(item, dict):
                 continue
             user_id = item.get('id')
@@ -88,93 +117,31 @@ class UsersRepository(BaseRepository):
             conclusion = item.get('conclusion')
             if not isinstance(conclusion, dict):
                 continue
-            existing_incoming = incoming_by_id.get(user_id)
-            if existing_incoming is None:
-                incoming_by_id[user_id] = conclusion
-            else:
-                incoming_by_id[user_id] = self._merge_conclusion_dicts(
-                    existing_incoming,
-                    conclusion,
-                )
-        if not incoming_by_id:
+            user_ids.append(user_id)
+            incoming.append(conclusion)
+        if not user_ids:
             return 0
-        existing_by_id: dict[int, dict[str, Any]] = {}
-        existing_rows = await self.pool.fetch(
-            'SELECT id, conclusion FROM users WHERE id = ANY($1)',
-            list(incoming_by_id.keys()),
+        # Merging happens under the row locks of the upsert, taken in id order so concurrent saves cannot deadlock.
+        result = await self.pool.execute(
+            """
+            INSERT INTO users (id, conclusion, updated_at)
+            SELECT id, conclusion_merge_agg(conclusion ORDER BY position), NOW()
+            FROM unnest($1::BIGINT[], $2::JSONB[]) WITH ORDINALITY AS item (id, conclusion, position)
+            GROUP BY id
+            ORDER BY id
+            ON CONFLICT (id)
+            DO UPDATE SET
+                conclusion = CASE
+                    WHEN jsonb_typeof(users.conclusion) = 'object'
+                        THEN conclusion_merge(users.conclusion, EXCLUDED.conclusion)
+                    ELSE EXCLUDED.conclusion
+                END,
+                updated_at = NOW()
+            """,
+            user_ids,
+            incoming,
         )
-        for row in existing_rows:
-            existing_conclusion = row['conclusion']
-            if not isinstance(existing_conclusion, dict):
-                continue
-            existing_by_id[int(row['id'])] = existing_conclusion
-        rows: list[tuple[int, dict[str, Any]]] = []
-        for user_id, incoming_conclusion in incoming_by_id.items():
-            existing_conclusion = existing_by_id.get(user_id)
-            if existing_conclusion is None:
-                merged = incoming_conclusion
-            else:
-                merged = self._merge_conclusion_dicts(
-                    existing_conclusion,
-                    incoming_conclusion,
-                )
-            rows.append((user_id, merged))
-        async with self.pool.acquire() as conn:
-            await conn.executemany(
-                """
-                INSERT INTO users (id, conclusion, updated_at)
-                VALUES ($1, $2, NOW())
-                ON CONFLICT (id)
-                DO UPDATE SET
-                    conclusion = EXCLUDED.conclusion,
-                    updated_at = NOW()
-                """,
-                rows,
-            )
-        return len(rows)
-
-    @classmethod
-    def _merge_conclusion_dicts(
-        cls,
-        current: dict[str, Any],
-        incoming: dict[str, Any],
-    ) -> dict[str, Any]:
-        merged = dict(current)
-        for key, incoming_value in incoming.items():
-            if key not in merged:
-                merged[key] = incoming_value
-                continue
-            merged[key] = cls._merge_conclusion_values(
-                merged[key],
-                incoming_value,
-            )
-        return merged
-
-    @classmethod
-    def _merge_conclusion_values(cls, current: Any, incoming: Any) -> Any:
-        if current is None:
-            return incoming
-        if incoming is None:
-            return current
-        if isinstance(current, dict) and isinstance(incoming, dict):
-            return cls._merge_conclusion_dicts(current, incoming)
-        if isinstance(current, list) and isinstance(incoming, list):
-            return cls._merge_conclusion_lists(current, incoming)
-        if isinstance(current, list):
-            return cls._merge_conclusion_lists(current, [incoming])
-        if isinstance(incoming, list):
-            return cls._merge_conclusion_lists([current], incoming)
-        if current == incoming:
-            return current
-        return cls._merge_conclusion_lists([current], [incoming])
-
-    @staticmethod
-    def _merge_conclusion_lists(current: list[Any], incoming: list[Any]) -> list[Any]:
-        merged: list[Any] = []
-        for value in [*current, *incoming]:
-            if value not in merged:
-                merged.append(value)
-        return merged
+        return int(result.split()[-1])
 
     async def ensure_users_exist(self, user_ids):
         if not user_ids:
@@ -190,16 +157,6 @@ class UsersRepository(BaseRepository):
                 [(user_id,) for user_id in user_ids],
             )
 
-    async def list_by_ids(self, user_ids: list[int]) -> list[dict[str, Any]]:
-        normalized = normalize_int_list(user_ids)
-        if not normalized:
-            return []
-        rows = await self.pool.fetch(
-            'SELECT * FROM users WHERE id = ANY($1)',
-            normalized,
-        )
-        return [dict(row) for row in rows]
-
     async def list_with_conclusions(
         self,
         limit: int = 200,
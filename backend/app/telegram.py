@@ -3,15 +3,41 @@ from telethon.sessions import StringSession
 
 from .config import TELEGRAM_API_HASH
 from .config import TELEGRAM_API_ID
+from .config import TELEGRAM_FLOOD_WAIT_MAX
+from .config import TELEGRAM_FLOOD_WAIT_RETRIES
+from .config import TELEGRAM_METHOD_CLASSES
+from .config import TELEGRAM_RATE_LIMITS
 from .config import TELETHON_STRING_SESSION
+from .ratelimit import TelegramScheduler
+
+
+class ScheduledTelegramClient(TelegramClient):
+    def __init__(self, scheduler: TelegramScheduler, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.scheduler = scheduler
+
+    async def __call__(self, request, ordered=False, flood_sleep_threshold=None):
+        return await self.scheduler.call(
+            request,
+            lambda: TelegramClient.__call__(self, request, ordered, flood_sleep_threshold),
+        )
 
 
 class Telegram:
     def __init__(self) -> None:
-        self.client: TelegramClient = TelegramClient(
+        self.scheduler: TelegramScheduler = TelegramScheduler(
+            TELEGRAM_RATE_LIMITS,
+            TELEGRAM_METHOD_CLASSES,
+            TELEGRAM_FLOOD_WAIT_MAX,
+            TELEGRAM_FLOOD_WAIT_RETRIES,
+        )
+        self.client: TelegramClient = ScheduledTelegramClient(
+            self.scheduler,
             StringSession(TELETHON_STRING_SESSION),
             TELEGRAM_API_ID,
             TELEGRAM_API_HASH,
+            # FloodWait is handled by the scheduler so it can pause only the affected method class.
+            flood_sleep_threshold=0,
         )
 
     async def init(self) -> None:
@@ -0,0 +1,69 @@
+import random
+import time
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+
+from app.chunking import estimate_tokens
+from app.chunking import pack_lines
+from app.chunking import parse_message_line_link
+from app.config import ANALYSIS_CHUNK_BUDGET
+
+
+SIZES = [1_000, 10_000, 100_000]
+FORMAT_HINT = 'FORMAT: time message_id user_id [@username] [-> reply_message_id]: text'
+
+
+def make_lines(count: int) -> list[str]:
+    rng = random.Random(count)
+    base_date = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    lines = []
+    for message_id in range(1, count + 1):
+        time_label = (base_date + timedelta(seconds=message_id * 7)).strftime('%H:%M:%S')
+        reply = f' -> {rng.randint(max(message_id - 50, 1), message_id)}' if message_id % 3 == 0 else ''
+        text = ' '.join(rng.choice(['привет', 'hello', 'канал', 'message', 'ok']) for _ in range(rng.randint(3, 80)))
+        lines.append(f'{time_label} {message_id} {1_000 + message_id % 500}{reply}: {text}')
+    return lines
+
+
+def split_recursive(message_lines: list[str], format_hint: str, max_chunk_size: int) -> list[list[str]]:
+    # The midpoint splitter that pack_lines replaced, kept here for comparison.
+    chunk = [format_hint, *message_lines]
+    if len('\n'.join(chunk)) <= max_chunk_size or len(message_lines) <= 1:
+        return [chunk]
+    midpoint = len(message_lines) // 2
+    return [
+        *split_recursive(message_lines[:midpoint], format_hint, max_chunk_size),
+        *split_recursive(message_lines[midpoint:], format_hint, max_chunk_size),
+    ]
+
+
+def main() -> None:
+    budget = ANALYSIS_CHUNK_BUDGET
+    variants = [
+        ('recursive', lambda lines: split_recursive(lines, FORMAT_HINT, budget)),
+        ('greedy', lambda lines: pack_lines(lines, budget, header=FORMAT_HINT)),
+        (
+            'threads',
+            lambda lines: pack_lines(
+                lines,
+                budget,
+                header=FORMAT_HINT,
+                reply_link=parse_message_line_link,
+            ),
+        ),
+        ('tokens', lambda lines: pack_lines(lines, budget // 4, estimate_tokens, FORMAT_HINT)),
+    ]
+    print(f"{'lines':>8} {'splitter':>10} {'seconds':>9} {'chunks':>7} {'avg fill':>9}")
+    for size in SIZES:
+        lines = make_lines(size)
+        for name, split in variants:
+            started = time.perf_counter()
+            chunks = split(lines)
+            elapsed = time.perf_counter() - started
+            fill = sum(len('\n'.join(chunk)) for chunk in chunks) / len(chunks) / budget
+            print(f'{size:>8} {name:>10} {elapsed:>9.4f} {len(chunks):>7} {fill:>9.1%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+import asyncio
+import time
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+
+from app.storage import Storage
+
+
+SIZES = [1_000, 10_000, 100_000]
+BATCH_SIZE = 10_000
+CHANNEL_ID = -1
+
+
+def make_messages(count: int, revision: int) -> list[dict]:
+    base_date = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    messages = []
+    for message_id in range(1, count + 1):
+        date = base_date + timedelta(seconds=message_id)
+        messages.append(
+            {
+                '_': 'Message',
+                'id': message_id,
+                'peer_id': {'_': 'PeerChannel', 'channel_id': CHANNEL_ID},
+                'date': date,
+                'message': f'Benchmark message {message_id} revision {revision} ' * 4,
+                'from_id': {'_': 'PeerUser', 'user_id': 1_000 + message_id % 500},
+                'reply_to': (
+                    {'_': 'MessageReplyHeader', 'reply_to_msg_id': message_id - 1}
+                    if message_id % 3 == 0 else None
+                ),
+                'entities': [
+                    {'_': 'MessageEntityBold', 'offset': 0, 'length': 9},
+                ],
+                'views': message_id * 7,
+                'edit_date': None,
+            }
+        )
+    return messages
+
+
+async def run_upsert(storage: Storage, messages: list[dict], bulk: bool) -> tuple[float, dict[str, int]]:
+    totals = {'processed': 0, 'upserted': 0, 'modified': 0, 'skipped': 0}
+    started = time.perf_counter()
+    for offset in range(0, len(messages), BATCH_SIZE):
+        stats = await storage.messages.upsert_many(
+            CHANNEL_ID,
+            messages[offset:offset + BATCH_SIZE],
+            bulk=bulk,
+        )
+        for key, value in stats.items():
+            totals[key] += value
+    return time.perf_counter() - started, totals
+
+
+async def main() -> None:
+    storage = Storage()
+    await storage.init()
+    try:
+        print(f"{'rows':>8} {'path':>7} {'phase':>9} {'seconds':>9} {'rows/s':>10}  stats")
+        for size in SIZES:
+            for bulk in (False, True):
+                await storage.messages.pool.execute(
+                    'DELETE FROM messages WHERE channel_id = $1',
+                    CHANNEL_ID,
+                )
+                phases = [
+                    ('insert', make_messages(size, 0)),
+                    ('unchanged', make_messages(size, 0)),
+                    ('modify', make_messages(size, 1)),
+                ]
+                for phase, messages in phases:
+                    elapsed, stats = await run_upsert(storage, messages, bulk)
+                    print(
+                        f"{size:>8} {'copy' if bulk else 'unnest':>7} {phase:>9} "
+                        f"{elapsed:>9.3f} {size / elapsed:>10.0f}  {stats}"
+                    )
+        await storage.messages.pool.execute(
+            'DELETE FROM messages WHERE channel_id = $1',
+            CHANNEL_ID,
+        )
+    finally:
+        await storage.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,74 @@
+import asyncio
+import os
+import time
+import unittest
+from types import SimpleNamespace
+
+
+os.environ.setdefault('POSTGRES_URL', 'postgresql://localhost/test')
+os.environ.setdefault('TELEGRAM_API_ID', '0')
+os.environ.setdefault('TELEGRAM_API_HASH', 'test')
+os.environ.setdefault('TELETHON_STRING_SESSION', 'test')
+os.environ.setdefault('DEEPSEEK_API_KEY', 'test')
+
+from openai import APIConnectionError  # noqa: E402
+
+from app.deepseek import DeepSeek  # noqa: E402
+from app.exceptions import DeepSeekUnavailableError  # noqa: E402
+
+
+class HangingCompletions:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        await asyncio.Event().wait()
+
+
+class HalfOpenProbeTest(unittest.IsolatedAsyncioTestCase):
+    async def test_cancelled_probe_does_not_keep_circuit_open(self) -> None:
+        deepseek = DeepSeek()
+        completions = HangingCompletions()
+        deepseek.client.chat.completions = completions
+        deepseek.breaker.opened_at = time.monotonic() - deepseek.breaker.reset_timeout
+
+        probe = asyncio.create_task(deepseek._create(messages=[]))
+        await asyncio.sleep(0)
+        with self.assertRaises(DeepSeekUnavailableError):
+            await deepseek._create(messages=[])
+        probe.cancel()
+        await asyncio.gather(probe, return_exceptions=True)
+
+        retry = asyncio.create_task(deepseek._create(messages=[]))
+        await asyncio.sleep(0)
+        self.assertEqual(completions.calls, 2)
+        retry.cancel()
+        await asyncio.gather(retry, return_exceptions=True)
+
+
+class BrokenStreamCompletions:
+    async def create(self, **kwargs):
+        async def stream():
+            yield SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content='partial'))])
+            raise APIConnectionError(request=None)
+
+        return stream()
+
+
+class StreamBreakerTest(unittest.IsolatedAsyncioTestCase):
+    async def test_stream_failing_midway_counts_against_the_api(self) -> None:
+        deepseek = DeepSeek()
+        deepseek.client.chat.completions = BrokenStreamCompletions()
+
+        received = []
+        with self.assertRaises(APIConnectionError):
+            async for content, _ in deepseek.stream_analysis('prompt', ['line']):
+                received.append(content)
+
+        self.assertEqual(received, ['partial'])
+        self.assertEqual(deepseek.breaker.failures, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
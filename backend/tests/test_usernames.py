@@ -0,0 +1,47 @@
+import asyncio
+import os
+import unittest
+from types import SimpleNamespace
+
+
+os.environ.setdefault('POSTGRES_URL', 'postgresql://localhost/test')
+os.environ.setdefault('TELEGRAM_API_ID', '0')
+os.environ.setdefault('TELEGRAM_API_HASH', 'test')
+os.environ.setdefault('TELETHON_STRING_SESSION', 'test')
+os.environ.setdefault('DEEPSEEK_API_KEY', 'test')
+
+from app.storage.users import UsersRepository  # noqa: E402
+
+
+class SlowPool:
+    def __init__(self) -> None:
+        self.fetching = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def fetch(self, query, user_ids):
+        self.fetching.set()
+        await self.release.wait()
+        # The row as it was when the lookup started.
+        return [{'id': user_id, 'username': 'old'} for user_id in user_ids]
+
+    async def fetchrow(self, query, user_id, username, *args):
+        return {'id': user_id, 'username': username}
+
+
+class UsernamesTest(unittest.IsolatedAsyncioTestCase):
+    async def test_write_through_during_lookup_wins(self) -> None:
+        users = UsersRepository()
+        pool = SlowPool()
+        users.db = SimpleNamespace(pool=pool)
+
+        lookup = asyncio.create_task(users.get_usernames([1, 2]))
+        await pool.fetching.wait()
+        await users.upsert({'id': 1, 'username': 'new'})
+        pool.release.set()
+
+        self.assertEqual(await lookup, {1: 'new', 2: 'old'})
+        self.assertEqual(users.usernames, {1: 'new', 2: 'old'})
+
+
+if __name__ == '__main__':
+    unittest.main()